@@ -0,0 +1,6 @@
+'''
+Benchmarks for skosprovider_rdf.
+
+These are not part of the test suite. Run them as a module from the root of
+the repository, eg. ``python -m benchmarks.bench_load``.
+'''
@@ -0,0 +1,37 @@
+'''
+Compare the memory held by an :class:`skosprovider_rdf.providers.RDFProvider`
+with and without `compact`, and the time a full :meth:`find` takes.
+
+Usage: ``python -m benchmarks.bench_compact [concepts]``
+'''
+import gc
+import sys
+import time
+import tracemalloc
+
+from skosprovider_rdf.providers import RDFProvider
+
+from .generator import generate_graph
+
+
+def main(concepts=10000):
+    graph = generate_graph(concepts=concepts, collections=concepts // 100)
+    print('%d concepts, %d triples' % (concepts, len(graph)))
+    for kwargs in ({}, {'compact': True}):
+        gc.collect()
+        tracemalloc.start()
+        provider = RDFProvider({'id': 'BENCH'}, graph, **kwargs)
+        gc.collect()
+        held = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        start = time.perf_counter()
+        provider.find({'label': 'concept'})
+        elapsed = time.perf_counter() - start
+        print('%-18s %8.1f MiB held %8.3fs find' % (
+            kwargs or 'eager', held / 2 ** 20, elapsed
+        ))
+        del provider
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
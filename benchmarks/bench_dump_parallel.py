@@ -0,0 +1,41 @@
+'''
+Benchmark dumping a provider to N-Triples with a growing number of worker
+processes, compared to the single process streaming dumper.
+
+Usage: ``python -m benchmarks.bench_dump_parallel [concepts]``
+'''
+import io
+import os
+import sys
+import time
+
+from skosprovider_rdf.providers import RDFProvider
+from skosprovider_rdf.utils import rdf_parallel_dumper
+from skosprovider_rdf.utils import rdf_stream_dumper
+
+from .generator import generate_graph
+
+
+def timed(f):
+    start = time.perf_counter()
+    f()
+    return time.perf_counter() - start
+
+
+def main(concepts=20000):
+    graph = generate_graph(concepts=concepts, collections=concepts // 100)
+    provider = RDFProvider({'id': 'BENCH'}, graph)
+    print('%d concepts' % concepts)
+    t = timed(lambda: rdf_stream_dumper(provider, io.StringIO()))
+    print('%-12s %8.3fs' % ('stream', t))
+    processes = 1
+    while processes <= (os.cpu_count() or 1):
+        t = timed(lambda: rdf_parallel_dumper(
+            provider, io.StringIO(), processes=processes
+        ))
+        print('%-12s %8.3fs' % ('%d processes' % processes, t))
+        processes *= 2
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,63 @@
+'''
+Compare the time and peak memory of parsing a file into an
+:class:`rdflib.graph.Graph` and building an
+:class:`skosprovider_rdf.providers.RDFProvider` from it against
+:meth:`skosprovider_rdf.providers.RDFProvider.from_file`.
+
+Usage: ``python -m benchmarks.bench_from_file [concepts] [noise]``
+'''
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from rdflib import Graph
+
+from skosprovider_rdf.providers import RDFProvider
+
+from .generator import generate_graph
+
+
+def from_graph(path):
+    graph = Graph()
+    graph.parse(path, format='nt')
+    return RDFProvider({'id': 'BENCH'}, graph)
+
+
+def from_file(path):
+    return RDFProvider.from_file({'id': 'BENCH'}, path, format='nt')
+
+
+def measure(build, path):
+    tracemalloc.start()
+    start = time.perf_counter()
+    provider = build(path)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return provider, elapsed, peak
+
+
+def main(concepts=10000, noise=10):
+    graph = generate_graph(
+        concepts=concepts, collections=concepts // 100, noise=noise
+    )
+    fd, path = tempfile.mkstemp(suffix='.nt')
+    os.close(fd)
+    try:
+        graph.serialize(path, format='nt', encoding='utf-8')
+        print('%d concepts, %d triples' % (concepts, len(graph)))
+        del graph
+        for build in (from_graph, from_file):
+            provider, elapsed, peak = measure(build, path)
+            print('%-12s %8.3fs %8.1f MiB peak %8d triples kept' % (
+                build.__name__, elapsed, peak / 2 ** 20, len(provider.graph)
+            ))
+            del provider
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,46 @@
+'''
+Compare loading an :class:`skosprovider_rdf.providers.RDFProvider` with the
+triples grouped per subject up front against looking them up one subject at a
+time.
+
+Usage: ``python -m benchmarks.bench_load [concepts]``
+'''
+import sys
+import timeit
+
+from rdflib.namespace import RDF
+from rdflib.namespace import SKOS
+
+from skosprovider_rdf.providers import RDFProvider
+from skosprovider_rdf.providers import _GroupedRecords
+from skosprovider_rdf.providers import _SubjectRecords
+
+from .generator import generate_graph
+
+
+def build(provider, records_class):
+    records = records_class(provider.graph, provider._record_predicates())
+    clist = [
+        provider._create_concept(sub, records)
+        for sub in provider.graph.subjects(RDF.type, SKOS.Concept)
+    ]
+    clist.extend(
+        provider._create_collection(sub, records)
+        for sub in provider.graph.subjects(RDF.type, SKOS.Collection)
+    )
+    return clist
+
+
+def main(concepts=10000):
+    graph = generate_graph(concepts=concepts, collections=concepts // 100)
+    provider = RDFProvider({'id': 'BENCH'}, graph)
+    print('%d concepts, %d triples' % (concepts, len(graph)))
+    for records_class in (_SubjectRecords, _GroupedRecords):
+        t = min(timeit.repeat(
+            lambda: build(provider, records_class), number=1, repeat=3
+        ))
+        print('%-16s %8.3fs' % (records_class.__name__, t))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,30 @@
+'''
+Benchmark filling the `member_of` attribute of concepts and collections for a
+vocabulary with many collections.
+
+Usage: ``python -m benchmarks.bench_member_of [concepts] [collections]``
+'''
+import sys
+import timeit
+
+from skosprovider_rdf.providers import RDFProvider
+
+from .generator import generate_graph
+
+
+def main(concepts=20000, collections=5000):
+    graph = generate_graph(concepts=concepts, collections=collections)
+    provider = RDFProvider({'id': 'BENCH'}, graph)
+    print('%d concepts, %d collections' % (concepts, collections))
+
+    def fill():
+        for c in provider.list:
+            c.member_of = []
+        provider._fill_member_of(provider.list)
+
+    t = min(timeit.repeat(fill, number=1, repeat=3))
+    print('_fill_member_of %8.3fs' % t)
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
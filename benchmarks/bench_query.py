@@ -0,0 +1,56 @@
+'''
+Compare an :class:`skosprovider_rdf.providers.RDFProvider` with a
+:class:`skosprovider_rdf.providers.QueryRDFProvider`: the memory they hold
+once created and the time the most common requests take.
+
+Usage: ``python -m benchmarks.bench_query [concepts] [lookups]``
+'''
+import gc
+import random
+import sys
+import time
+import tracemalloc
+
+from skosprovider_rdf.providers import QueryRDFProvider
+from skosprovider_rdf.providers import RDFProvider
+
+from .generator import generate_graph
+
+
+def main(concepts=10000, lookups=100):
+    graph = generate_graph(concepts=concepts, collections=concepts // 100)
+    print('%d concepts, %d triples' % (concepts, len(graph)))
+    ids = None
+    for cls in (RDFProvider, QueryRDFProvider):
+        gc.collect()
+        tracemalloc.start()
+        start = time.perf_counter()
+        provider = cls({'id': 'BENCH'}, graph)
+        elapsed = time.perf_counter() - start
+        gc.collect()
+        held = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print('%-18s %8.1f MiB held %8.3fs load' % (
+            cls.__name__, held / 2 ** 20, elapsed
+        ))
+        if ids is None:
+            ids = [
+                c.id for c in random.Random(0).sample(
+                    list(provider.list), min(lookups, len(provider.list))
+                )
+            ]
+        for name, f in (
+                ('get_by_id', lambda: [provider.get_by_id(id) for id in ids]),
+                ('find', lambda: provider.find({'label': 'concept 1'})),
+                ('expand', lambda: [provider.expand(id) for id in ids]),
+                ('get_top_concepts', provider.get_top_concepts)):
+            start = time.perf_counter()
+            f()
+            print('%-18s %-18s %8.3fs' % (
+                '', name, time.perf_counter() - start
+            ))
+        del provider
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,46 @@
+'''
+Compare building one :class:`skosprovider_rdf.providers.RDFProvider` per
+conceptscheme with
+:meth:`skosprovider_rdf.providers.RDFProvider.for_schemes`.
+
+Usage: ``python -m benchmarks.bench_schemes [concepts] [schemes]``
+'''
+import sys
+import timeit
+
+from skosprovider_rdf.providers import RDFProvider
+
+from .generator import generate_graph
+from .generator import scheme_uris
+
+
+def one_by_one(graph, metadata):
+    return {
+        uri: RDFProvider(md, graph, concept_scheme_uri=uri)
+        for uri, md in metadata.items()
+    }
+
+
+def for_schemes(graph, metadata):
+    return RDFProvider.for_schemes(metadata, graph)
+
+
+def main(concepts=10000, schemes=5):
+    graph = generate_graph(
+        concepts=concepts, collections=concepts // 100, schemes=schemes
+    )
+    metadata = {
+        uri: {'id': 'SCHEME%d' % i}
+        for i, uri in enumerate(scheme_uris(schemes))
+    }
+    print('%d concepts, %d schemes, %d triples' % (
+        concepts, schemes, len(graph)))
+    for build in (one_by_one, for_schemes):
+        t = min(timeit.repeat(
+            lambda: build(graph, metadata), number=1, repeat=3
+        ))
+        print('%-12s %8.3fs' % (build.__name__, t))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
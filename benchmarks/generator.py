@@ -0,0 +1,124 @@
+'''
+This module generates synthetic SKOS graphs that can be used for benchmarking.
+'''
+import random
+
+from rdflib import Graph
+from rdflib import Literal
+from rdflib import Namespace
+from rdflib.term import BNode
+from rdflib.namespace import DCTERMS
+from rdflib.namespace import RDF
+from rdflib.namespace import RDFS
+from rdflib.namespace import SKOS
+from rdflib.term import URIRef
+
+SKOS_THES = Namespace('http://purl.org/iso25964/skos-thes#')
+
+SCHEME_URI = 'http://id.example.org/scheme'
+
+
+def generate_graph(concepts=1000, collections=10, languages=('nl', 'en'),
+                   seed=0, noise=0, schemes=1, depth=None, nesting=0,
+                   html_notes=0, sources=0):
+    '''
+    Generate a synthetic SKOS graph.
+
+    The concepts form a tree where every concept has a broader concept that
+    was created before it. The collections each get a random sample of
+    concepts as members. Collections are nested in chains of `nesting + 1`
+    collections, where the first collection of every chain is a subordinate
+    array of a concept.
+
+    :param int concepts: Number of concepts to generate.
+    :param int collections: Number of collections to generate.
+    :param tuple languages: Languages to generate labels and notes in.
+    :param int seed: Seed for the random generator, so the same arguments
+        always generate the same graph.
+    :param int noise: Number of triples per concept that an RDFProvider
+        does not read, like other vocabularies in the same file.
+    :param int schemes: Number of conceptschemes to spread the concepts and
+        collections over. The first one is always :data:`SCHEME_URI`, the
+        others are returned by :func:`scheme_uris`.
+    :param int depth: Maximum depth of the hierarchy of concepts, or `None`
+        for no maximum.
+    :param int nesting: Number of collections nested in every chain of
+        collections.
+    :param int html_notes: Number of HTML notes per concept and language.
+    :param int sources: Number of sources per concept.
+    :rtype: :class:`rdflib.graph.Graph`
+    '''
+    rnd = random.Random(seed)
+    graph = Graph()
+    scheme_list = [URIRef(uri) for uri in scheme_uris(schemes)]
+    for scheme in scheme_list:
+        graph.add((scheme, RDF.type, SKOS.ConceptScheme))
+        graph.add((scheme, SKOS.prefLabel, Literal('Scheme', lang='en')))
+    uris = []
+    levels = []
+    for i in range(concepts):
+        uri = URIRef('%s/concepts/%d' % (SCHEME_URI, i))
+        scheme = scheme_list[i % schemes]
+        graph.add((uri, RDF.type, SKOS.Concept))
+        graph.add((uri, SKOS.inScheme, scheme))
+        graph.add((uri, DCTERMS.identifier, Literal(str(i))))
+        for lang in languages:
+            graph.add((uri, SKOS.prefLabel, Literal('concept %d %s' % (i, lang), lang=lang)))
+            graph.add((uri, SKOS.altLabel, Literal('term %d %s' % (i, lang), lang=lang)))
+            graph.add((uri, SKOS.definition, Literal('Definition of %d.' % i, lang=lang)))
+            for j in range(html_notes):
+                graph.add((uri, SKOS.scopeNote, Literal(
+                    '<p xml:lang="%s">Note %d on <strong>%d</strong>.</p>' % (lang, j, i),
+                    datatype=RDF.HTML
+                )))
+        level = 0
+        if len(uris) >= schemes:
+            b = rnd.randrange(len(uris) // schemes) * schemes + i % schemes
+            while depth is not None and levels[b] >= depth - 1:
+                b -= schemes
+            if b >= 0:
+                broader = uris[b]
+                level = levels[b] + 1
+                graph.add((uri, SKOS.broader, broader))
+                graph.add((broader, SKOS.narrower, uri))
+        for j in range(sources):
+            source = BNode()
+            graph.add((uri, DCTERMS.source, source))
+            graph.add((source, RDF.type, DCTERMS.BibliographicResource))
+            graph.add((source, DCTERMS.bibliographicCitation, Literal(
+                'Source %d of %d.' % (j, i)
+            )))
+        graph.add((uri, SKOS.exactMatch, URIRef('http://example.com/%d' % i)))
+        for j in range(noise):
+            graph.add((uri, RDFS.comment, Literal('Comment %d on %d.' % (j, i))))
+        uris.append(uri)
+        levels.append(level)
+    collection_uris = []
+    for i in range(collections):
+        uri = URIRef('%s/collections/%d' % (SCHEME_URI, i))
+        graph.add((uri, RDF.type, SKOS.Collection))
+        graph.add((uri, SKOS.inScheme, scheme_list[i % schemes]))
+        graph.add((uri, DCTERMS.identifier, Literal('c%d' % i)))
+        graph.add((uri, SKOS.prefLabel, Literal('collection %d' % i, lang='en')))
+        for m in rnd.sample(uris, min(len(uris), 10)):
+            graph.add((uri, SKOS.member, m))
+        if i % (nesting + 1):
+            graph.add((collection_uris[-1], SKOS.member, uri))
+        elif nesting and uris:
+            superordinate = rnd.choice(uris)
+            graph.add((uri, SKOS_THES.superOrdinate, superordinate))
+            graph.add((superordinate, SKOS_THES.subordinateArray, uri))
+        collection_uris.append(uri)
+    return graph
+
+
+def scheme_uris(schemes=1):
+    '''
+    The uris of the conceptschemes :func:`generate_graph` generates.
+
+    :param int schemes: Number of conceptschemes.
+    :rtype: list
+    '''
+    return [SCHEME_URI] + [
+        '%s/%d' % (SCHEME_URI, i) for i in range(1, schemes)
+    ]
@@ -0,0 +1,189 @@
+'''
+Run the benchmark suite and write the results as JSON, so results of
+different releases can be compared.
+
+Every stage is timed a number of times and the fastest run is kept. The peak
+memory of a stage is measured with :mod:`tracemalloc` in a separate run, since
+tracing slows it down.
+
+Usage::
+
+    python -m benchmarks.suite --sizes 1000,10000 --output results.json
+    python -m benchmarks.suite --sizes 1000 --compare results.json
+'''
+import argparse
+import io
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from importlib.metadata import version
+
+from skosprovider_rdf.providers import RDFProvider
+from skosprovider_rdf.utils import rdf_c_dumper
+from skosprovider_rdf.utils import rdf_dumper
+from skosprovider_rdf.utils import rdf_stream_dumper
+
+from .generator import generate_graph
+
+
+def stages(graph, lookups, seed=0):
+    '''
+    The stages to benchmark for a graph.
+
+    :param rdflib.graph.Graph graph: The graph to load.
+    :param int lookups: Number of concepts to look up, expand or dump in the
+        stages that work on a single concept.
+    :returns: A list of tuples of a name and a callable that runs the stage.
+        All stages but the load stage work on the same provider.
+    '''
+    provider = RDFProvider({'id': 'BENCH'}, graph)
+    rnd = random.Random(seed)
+    ids = [c.id for c in rnd.sample(provider.list, min(lookups, len(provider.list)))]
+    dumped = rdf_dumper(provider)
+
+    def expand():
+        # Forget the results of the previous run, so every run traverses the
+        # hierarchy instead of looking up the memo.
+        provider._reset_hierarchy()
+        return [provider.expand(id) for id in ids]
+
+    return [
+        ('load', lambda: RDFProvider({'id': 'BENCH'}, graph)),
+        ('get_by_id', lambda: [provider.get_by_id(id) for id in ids]),
+        ('find', lambda: [
+            provider.find({'label': label})
+            for label in ('concept 1', 'term', 'does not exist')
+        ]),
+        ('expand', expand),
+        ('rdf_dumper', lambda: rdf_dumper(provider)),
+        ('rdf_c_dumper', lambda: [rdf_c_dumper(provider, id) for id in ids]),
+        ('serialize_turtle', lambda: dumped.serialize(format='turtle')),
+        ('serialize_nt', lambda: dumped.serialize(format='nt')),
+        ('rdf_stream_dumper', lambda: rdf_stream_dumper(
+            provider, io.StringIO(), format='nt'
+        )),
+    ]
+
+
+def measure(f, repeat):
+    '''
+    :returns: A tuple of the fastest time in seconds and the peak memory in
+        bytes of running `f`.
+    '''
+    seconds = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        f()
+        elapsed = time.perf_counter() - start
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+    tracemalloc.start()
+    f()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def run(sizes, repeat=3, lookups=100, generator_args=None):
+    '''
+    Run all stages for every size.
+
+    :param list sizes: Numbers of concepts to generate graphs for.
+    :param int repeat: Number of times to time every stage.
+    :param int lookups: See :func:`stages`.
+    :param dict generator_args: Extra arguments for
+        :func:`benchmarks.generator.generate_graph`.
+    :rtype: dict
+    '''
+    generator_args = generator_args or {}
+    results = []
+    for concepts in sizes:
+        graph = generate_graph(
+            concepts=concepts, collections=concepts // 100, **generator_args
+        )
+        for name, f in stages(graph, lookups):
+            seconds, peak = measure(f, repeat)
+            results.append({
+                'concepts': concepts,
+                'triples': len(graph),
+                'stage': name,
+                'seconds': seconds,
+                'peak_bytes': peak,
+            })
+            print('%8d %-18s %10.4fs %10.1f MiB' % (
+                concepts, name, seconds, peak / 2 ** 20
+            ), file=sys.stderr)
+    return {
+        'skosprovider_rdf': version('skosprovider_rdf'),
+        'python': platform.python_version(),
+        'repeat': repeat,
+        'lookups': lookups,
+        'generator': generator_args,
+        'results': results,
+    }
+
+
+def compare(old, new):
+    '''
+    Print the ratio between the results of two runs for every stage they
+    have in common to stderr.
+    '''
+    previous = {
+        (r['concepts'], r['stage']): r for r in old['results']
+    }
+    print('%8s %-18s %10s %10s' % ('concepts', 'stage', 'time', 'memory'),
+          file=sys.stderr)
+    for r in new['results']:
+        o = previous.get((r['concepts'], r['stage']))
+        if o is None:
+            continue
+        print('%8d %-18s %9.2fx %9.2fx' % (
+            r['concepts'], r['stage'],
+            r['seconds'] / o['seconds'] if o['seconds'] else float('nan'),
+            r['peak_bytes'] / o['peak_bytes'] if o['peak_bytes'] else float('nan'),
+        ), file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='1000,10000',
+                        help='Comma separated numbers of concepts.')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--lookups', type=int, default=100)
+    parser.add_argument('--depth', type=int, default=None)
+    parser.add_argument('--nesting', type=int, default=0)
+    parser.add_argument('--languages', default='nl,en')
+    parser.add_argument('--html-notes', type=int, default=0)
+    parser.add_argument('--sources', type=int, default=0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='File to write the results to.')
+    parser.add_argument('--compare', help='Results of an earlier run.')
+    args = parser.parse_args(argv)
+    results = run(
+        [int(size) for size in args.sizes.split(',')],
+        repeat=args.repeat,
+        lookups=args.lookups,
+        generator_args={
+            'depth': args.depth,
+            'nesting': args.nesting,
+            'languages': args.languages.split(','),
+            'html_notes': args.html_notes,
+            'sources': args.sources,
+            'seed': args.seed,
+        }
+    )
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    else:
+        json.dump(results, sys.stdout, indent=2, sort_keys=True)
+        print()
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+
+if __name__ == '__main__':
+    main()
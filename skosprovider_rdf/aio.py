@@ -0,0 +1,169 @@
+'''
+This module contains :mod:`asyncio` entry points for building and dumping
+providers.
+
+Parsing, building and serialising are CPU-bound and would block the event
+loop, so they run in an executor. Every function takes an optional
+:class:`asyncio.Semaphore` that bounds how many of them run at the same time.
+
+The executor has to be a thread pool: the work is stopped through objects
+shared with the event loop, which can't be sent to another process.
+'''
+import asyncio
+import functools
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from rdflib import Graph
+
+from skosprovider_rdf.providers import RDFProvider
+from skosprovider_rdf import utils
+
+
+class _Cancelled(Exception):
+    '''
+    Raised in the executor to stop work that is no longer awaited.
+    '''
+
+
+async def _run(executor, semaphore, f, *args):
+    '''
+    Run `f` in the executor while holding the semaphore.
+
+    Work that already started in the executor can't be interrupted when the
+    awaiting task is cancelled, so the semaphore is only released once `f`
+    returns.
+    '''
+    if isinstance(executor, ProcessPoolExecutor):
+        raise ValueError('Only thread pools are supported as executor.')
+    loop = asyncio.get_running_loop()
+    if semaphore is None:
+        return await loop.run_in_executor(executor, f, *args)
+    await semaphore.acquire()
+    try:
+        future = loop.run_in_executor(executor, f, *args)
+    except BaseException:
+        semaphore.release()
+        raise
+
+    def _done(future):
+        semaphore.release()
+        # Nobody awaits the result of a cancelled task.
+        if not future.cancelled():
+            future.exception()
+    future.add_done_callback(_done)
+    return await asyncio.shield(future)
+
+
+def _checkpoint(cancelled):
+    '''
+    Create a checkpoint that stops building a provider at the next stage
+    once `cancelled` is set.
+    '''
+    def check(stage):
+        if cancelled.is_set():
+            raise _Cancelled(stage)
+    return check
+
+
+async def load_provider(metadata, source, format=None, cls=RDFProvider,
+                        executor=None, semaphore=None, **kwargs):
+    '''
+    Build a provider without blocking the event loop.
+
+    When the task is cancelled, building stops at the next stage of
+    building the provider, the stages that are reported to an `instrument`
+    callback. No statistics are collected unless an `instrument` is passed.
+    A file that is being parsed is parsed completely first.
+
+    :param dict metadata: A dictionary with keywords like language.
+    :param source: An :class:`rdflib.graph.Graph`, or one or more files
+        that are read with :meth:`RDFProvider.from_file`.
+    :param str format: The format of the files. Guessed from the file
+        extension if not present.
+    :param cls: The provider class to build.
+    :param concurrent.futures.ThreadPoolExecutor executor: The executor to
+        build the provider in. Defaults to the executor of the event loop.
+    :param asyncio.Semaphore semaphore: Limits the number of providers that
+        are built and dumped at the same time. A cancelled build holds it
+        until it stopped.
+    :rtype: :class:`skosprovider_rdf.providers.RDFProvider`
+    '''
+    cancelled = threading.Event()
+    kwargs['_checkpoint'] = _checkpoint(cancelled)
+    if isinstance(source, Graph):
+        build = functools.partial(cls, metadata, source, **kwargs)
+    else:
+        build = functools.partial(
+            cls.from_file, metadata, source, format, **kwargs
+        )
+    try:
+        return await _run(executor, semaphore, build)
+    except asyncio.CancelledError:
+        cancelled.set()
+        raise
+
+
+def _next_chunks(chunks, size, lock, cancelled):
+    '''
+    Get the next `size` chunks. Closes `chunks` when the dump was cancelled
+    while they were being serialised.
+    '''
+    with lock:
+        batch = []
+        for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) >= size or cancelled.is_set():
+                break
+        if cancelled.is_set():
+            chunks.close()
+        return batch
+
+
+async def rdf_chunk_dumper(provider, format='nt', id_list=None,
+                           chunk_size=100, executor=None, semaphore=None,
+                           instrument=None):
+    '''
+    Dump a provider as an asynchronous sequence of serialised chunks, without
+    blocking the event loop. See :func:`skosprovider_rdf.utils.rdf_chunk_dumper`.
+
+    Concepts and collections are serialised in the executor, `chunk_size` at
+    a time, and every chunk of output contains at most that many of them.
+    When the consumer stops or is cancelled, no more concepts or collections
+    are serialised.
+
+    :param skosprovider.providers.VocabularyProvider provider: The provider
+        that wil be dumped.
+    :param str format: Either `nt` for N-Triples or `turtle` for Turtle.
+    :param List id_list: List of id's of the data to dump. Defaults to all
+        concepts and collections.
+    :param int chunk_size: The maximum number of concepts and collections
+        in every chunk.
+    :param concurrent.futures.ThreadPoolExecutor executor: The executor to
+        serialise the chunks in. Defaults to the executor of the event loop.
+    :param asyncio.Semaphore semaphore: Limits the number of providers that
+        are built and dumped at the same time. It is only held while a chunk
+        is serialised.
+    :param instrument: See :func:`skosprovider_rdf.utils.rdf_dumper`.
+
+    :rtype: An asynchronous generator of :class:`str`.
+    '''
+    chunks = utils.rdf_chunk_dumper(provider, format, id_list, instrument)
+    lock = threading.Lock()
+    cancelled = threading.Event()
+    try:
+        while True:
+            batch = await _run(
+                executor, semaphore, _next_chunks,
+                chunks, chunk_size, lock, cancelled
+            )
+            if not batch:
+                return
+            yield ''.join(batch)
+    finally:
+        cancelled.set()
+        if lock.acquire(blocking=False):
+            try:
+                chunks.close()
+            finally:
+                lock.release()
@@ -4,15 +4,34 @@ This module contains an RDFProvider, an implementation of the
 :class:`rdflib.graph.Graph` as input.
 '''
 
+import copy
+import functools
+import hashlib
+import io
+import itertools
+import json
 import logging
+import os
+import pickle
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from collections.abc import Sequence
 
 import rdflib
 from language_tags import tags
+from rdflib.exceptions import UniquenessError
 from rdflib.namespace import DC
 from rdflib.namespace import DCTERMS
 from rdflib.namespace import RDF
 from rdflib.namespace import SKOS
+from rdflib.namespace import XSD
+from rdflib.plugins.stores.memory import Memory
+from rdflib.term import BNode
+from rdflib.term import Literal
 from rdflib.term import URIRef
+from rdflib.util import guess_format
 from skosprovider.providers import MemoryProvider
 from skosprovider.skos import Collection
 from skosprovider.skos import Concept
@@ -22,12 +41,267 @@ from skosprovider.skos import Note
 from skosprovider.skos import Source
 from skosprovider.uri import DefaultConceptSchemeUrnGenerator
 
+from skosprovider_rdf.utils import _NO_STAGES
+from skosprovider_rdf.utils import _reachable_union
+from skosprovider_rdf.utils import _stages
 from skosprovider_rdf.utils import text_
 
 log = logging.getLogger(__name__)
 
 SKOS_THES = rdflib.Namespace('http://purl.org/iso25964/skos-thes#')
 
+LABEL_NGRAM = 3
+'''
+Length of the n-grams in the label index, see :meth:`RDFProvider.find`.
+'''
+
+SNAPSHOT_VERSION = 3
+'''
+Version of the snapshot format, see :meth:`RDFProvider.dump_snapshot`.
+'''
+
+IDENTIFIER_PREDICATES = (DCTERMS.identifier, DC.identifier)
+'''
+Predicates that can hold the identifier of a subject, in order of preference.
+'''
+
+SKOS_NAMESPACES = (str(SKOS), str(DC), str(DCTERMS), str(SKOS_THES))
+'''
+Namespaces of the predicates an :class:`RDFProvider` reads, see
+:meth:`RDFProvider.from_file`.
+'''
+
+
+class _SkosStore(Memory):
+    '''
+    A store that only keeps the triples an :class:`RDFProvider` reads.
+
+    Triples are filtered as they are added to the store, so a parser never
+    stores the triples that are not needed, also when it adds them to the
+    store directly instead of through the graph. Next to the triples with a
+    predicate in :data:`SKOS_NAMESPACES`, only the `rdf:type` triples with a
+    SKOS or skos-thes type are kept.
+    '''
+
+    def add(self, triple, context, quoted=False):
+        if _keep_triple(triple):
+            super().add(triple, context, quoted)
+
+
+def _keep_triple(triple):
+    p = triple[1]
+    if p == RDF.type:
+        return str.startswith(triple[2], SKOS_NAMESPACES)
+    return str.startswith(p, SKOS_NAMESPACES)
+
+
+class _GroupedRecords:
+    '''
+    The triples needed to build concepts and collections, grouped by subject.
+
+    The graph is walked once for every predicate, instead of once for every
+    subject and predicate.
+    '''
+
+    def __init__(self, graph, predicates):
+        self.records = {}
+        for p in predicates:
+            for s, o in graph.subject_objects(p):
+                self.records.setdefault(s, {}).setdefault(p, []).append(o)
+
+    def record(self, subject, predicates=None):
+        '''
+        :param subject: The subject to get the record for.
+        :param predicates: Ignored, all predicates are grouped up front.
+        :returns: A :class:`dict` of predicates and lists of objects.
+        '''
+        return self.records.get(subject, {})
+
+
+class _SubjectRecords:
+    '''
+    The triples needed to build concepts and collections, looked up in the
+    graph one subject at a time.
+    '''
+
+    def __init__(self, graph, predicates):
+        self.graph = graph
+        self.predicates = predicates
+
+    def record(self, subject, predicates=None):
+        '''
+        :param subject: The subject to get the record for.
+        :param predicates: The predicates to look up. Defaults to all
+            predicates this instance was created with.
+        :returns: A :class:`dict` of predicates and lists of objects.
+        '''
+        record = {}
+        for p in predicates or self.predicates:
+            objects = list(self.graph.objects(subject, p))
+            if objects:
+                record[p] = objects
+        return record
+
+
+@functools.lru_cache(maxsize=None)
+def _scrub_language(language):
+    '''
+    Check if a language is a valid IANA language tag.
+
+    Results are cached, since a vocabulary only uses a handful of different
+    languages. This also means an invalid language is only logged once.
+
+    :param str language: The language tag to check.
+    :returns: The language tag or `und` if it is not valid.
+    '''
+    if tags.check(language):
+        return language
+    else:
+        log.warning(
+            'Encountered an invalid language %s. Falling back to "und".' % language)
+        return 'und'
+
+
+@functools.lru_cache(maxsize=4096)
+def _read_html(literal):
+    '''
+    Serialise the DOM of an `rdf:HTML` literal without the `xml:lang` of its
+    first element.
+
+    The DOM is written as :meth:`xml.dom.minidom.Node.toxml` would write it,
+    but only the first element itself is copied, without its children, to
+    write its start tag without `xml:lang`. So the DOM of the literal does
+    not need to be copied. Results are cached, so concepts and collections
+    that are built again don't serialise their notes again.
+
+    :param rdflib.term.Literal literal: A literal with datatype `rdf:HTML`.
+    :returns: A tuple of the HTML and the language, or `None` if the first
+        element has no `xml:lang`.
+    '''
+    fragment = literal.value
+    first = fragment.firstChild
+    if not first or not first.attributes or \
+            'xml:lang' not in first.attributes.keys():
+        return fragment.toxml(), None
+    # A copy without children is written as an empty element, eg. <p a="b"/>.
+    # Writing it with minidom escapes the attributes the way toxml does on
+    # every version of Python.
+    head = first.cloneNode(False)
+    head.removeAttribute('xml:lang')
+    out = io.StringIO()
+    if first.childNodes:
+        out.write(head.toxml()[:-2] + '>')
+        for node in first.childNodes:
+            node.writexml(out, '', '', '')
+        out.write('</%s>' % first.tagName)
+    else:
+        out.write(head.toxml())
+    for node in fragment.childNodes[1:]:
+        node.writexml(out, '', '', '')
+    return out.getvalue(), first.getAttribute('xml:lang')
+
+
+def _parse(files, format, graph):
+    if isinstance(files, (str, os.PathLike)) or hasattr(files, 'read'):
+        files = [files]
+    for file in files:
+        if format is None and isinstance(file, (str, os.PathLike)):
+            graph.parse(file, format=guess_format(os.fspath(file)))
+        else:
+            graph.parse(file, format=format)
+    return graph
+
+
+def _serialisable(value):
+    try:
+        json.dumps(value)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+def _interned(values):
+    return tuple(_intern(v) for v in values)
+
+
+def _restore(cls, **attributes):
+    '''
+    Create an object from attributes that were validated when it was first
+    created, without validating them again.
+    '''
+    obj = cls.__new__(cls)
+    obj.__dict__.update(attributes)
+    return obj
+
+
+class _LazyList(Sequence):
+    '''
+    A read-only list of concepts and collections that are built when they are
+    first accessed.
+
+    Built items are kept in a cache, optionally bounded to a number of most
+    recently used items.
+    '''
+
+    def __init__(self, materialize, length, cache_size=None):
+        '''
+        :param materialize: Callable that builds the item at a position.
+        :param int length: Number of items in the list.
+        :param int cache_size: Maximum number of items to keep, or `None` to
+            keep every item that was built.
+        '''
+        self._materialize = materialize
+        self._length = length
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._length))]
+        if i < 0:
+            i += self._length
+        if not 0 <= i < self._length:
+            raise IndexError('list index out of range')
+        with self._lock:
+            if i in self._cache:
+                self.hits += 1
+                self._cache.move_to_end(i)
+                return self._cache[i]
+            self.misses += 1
+        c = self._materialize(i)
+        with self._lock:
+            self._cache[i] = c
+            if self.cache_size is not None and len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return c
+
+    def __iter__(self):
+        for i in range(self._length):
+            yield self[i]
+
+    def __copy__(self):
+        return list(self)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_cache'] = OrderedDict()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
 
 class RDFProvider(MemoryProvider):
 
@@ -46,29 +320,321 @@ class RDFProvider(MemoryProvider):
     '''
 
     def __init__(self, metadata, graph, **kwargs):
+        '''
+        :param dict metadata: A dictionary with keywords like language.
+        :param rdflib.graph.Graph graph: The graph to read the concepts and
+            collections from.
+        :param str concept_scheme_uri: The URI of the conceptscheme to use
+            when the graph contains more than one.
+        :param Boolean lazy: Only index the subjects and their identifiers
+            when creating the provider and build the concepts and collections
+            when they are first requested. Defaults to `False`.
+        :param int cache_size: When `lazy` or `compact` is set, the maximum
+            number of concepts and collections to keep once they are built.
+            `None` means every one that has been built is kept. Defaults to
+            `None` when `lazy` is set and to `0` when `compact` is set.
+        :param Boolean label_index: Build an index of all labels, so
+            :meth:`find` can search for labels without looking at every
+            concept and collection. Can not be combined with `lazy`.
+            Defaults to `False`.
+        :param Boolean compact: Keep the concepts and collections as compact
+            records and build them again when they are requested, to use
+            less memory. The strings that repeat between them, like ids,
+            uris, types and languages, are only kept once. A compact provider
+            can not be updated. Can not be combined with `lazy`. Defaults to
+            `False`.
+        :param Boolean release_graph: Drop the reference to the graph once
+            all concepts and collections are built. A provider without a
+            graph can not be updated. Can not be combined with `lazy`.
+            Defaults to `False`.
+        :param instrument: A callable that is called with the name and a
+            :class:`dict` of statistics of every stage of building the
+            provider, eg. :func:`skosprovider_rdf.utils.log_stage`. The
+            statistics contain the wall time of the stage in `seconds` and
+            counts like the number of subjects, triples and objects.
+        '''
+        stages = _stages(
+            kwargs.get('instrument'), kwargs.pop('_checkpoint', None)
+        )
+        languages = _scrub_language.cache_info()
         self.graph = graph
         self.check_in_scheme = False
+        self.lazy = kwargs.get('lazy', False)
+        self._label_index = None
+        if self.lazy and kwargs.get('label_index'):
+            raise ValueError('A lazy RDFProvider can not have a label index.')
+        if self.lazy and kwargs.get('release_graph'):
+            raise ValueError('A lazy RDFProvider can not release its graph.')
+        self.compact = kwargs.get('compact', False)
+        if self.lazy and self.compact:
+            raise ValueError('A lazy RDFProvider can not be compact.')
+        scan = kwargs.pop('_scan', None)
+        if scan is not None and 'identifiers' in scan:
+            self._identifiers, self._identifier_conflicts = scan['identifiers']
+        else:
+            self._index_identifiers()
+            if scan is not None:
+                scan['identifiers'] = (
+                    self._identifiers, self._identifier_conflicts
+                )
+        stages.done(
+            'identifiers', subjects=len(self._identifiers),
+            conflicts=len(self._identifier_conflicts)
+        )
         if not 'concept_scheme' in kwargs:
-            kwargs['concept_scheme'] = self._cs_from_graph(metadata, **kwargs)
+            kwargs['concept_scheme'] = self._cs_from_graph(
+                metadata, scan, **kwargs)
         else:
             self.check_in_scheme = True
         super().__init__(metadata, [], **kwargs)
-        self.list = self._from_graph()
-
-    def _cs_from_graph(self, metadata, **kwargs):
-        cslist = []
-        for sub in self.graph.subjects(RDF.type, SKOS.ConceptScheme):
-            uri = self.to_text(sub)
-            cs = ConceptScheme(
-                uri=uri,
-                labels=self._create_from_subject_typelist(
-                    sub, self._scrub_label_types()),
-                notes=self._create_from_subject_typelist(
-                    sub, Note.valid_types),
-                sources=self._create_sources(sub),
-                languages=self._create_languages(sub)
+        stages.done('conceptscheme')
+        if self.lazy:
+            self.list = self._index_graph(kwargs.get('cache_size'))
+            stages.done('index', subjects=len(self.list))
+        else:
+            self.list = self._from_graph(scan, stages)
+            self._index_list()
+            stages.done('index', ids=len(self._ids), uris=len(self._uris))
+            if kwargs.get('label_index'):
+                self._index_labels()
+                stages.done('label_index', ngrams=len(self._label_index))
+            if self.compact:
+                self.list = self._compact_list(
+                    self.list, kwargs.get('cache_size', 0)
+                )
+                stages.done('compact', records=len(self._records))
+        self._declared_top_concepts = self._get_declared_top_concepts()
+        self._reset_hierarchy()
+        stages.done(
+            'top_concepts', declared=len(self._declared_top_concepts)
+        )
+        if stages.enabled:
+            info = _scrub_language.cache_info()
+            stages.total(
+                'load', objects=len(self.list),
+                language_cache_hits=info.hits - languages.hits,
+                language_cache_misses=info.misses - languages.misses
             )
-            cslist.append(cs)
+        if kwargs.get('release_graph'):
+            self.graph = None
+            self._identifiers = {}
+            self._identifier_conflicts = {}
+
+    def dump_snapshot(self, path):
+        '''
+        Save this provider, with all concepts and collections built, to a
+        snapshot on disk.
+
+        The graph is not part of the snapshot, so a provider loaded from it
+        has no graph.
+
+        :param str path: The file to write the snapshot to.
+        :raises ValueError: If this is a lazy provider, since it can't work
+            without its graph.
+        '''
+        if self.lazy:
+            raise ValueError('A lazy RDFProvider can not be saved to a snapshot.')
+        state = {
+            k: v for k, v in self.__dict__.items()
+            if k not in ('graph', '_identifiers', '_identifier_conflicts')
+        }
+        if self.compact:
+            state['list'] = None
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(
+                    (SNAPSHOT_VERSION, state), f, pickle.HIGHEST_PROTOCOL
+                )
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    @classmethod
+    def load_snapshot(cls, path):
+        '''
+        Load a provider from a snapshot created by :meth:`dump_snapshot`.
+
+        Snapshots are pickles, so only load snapshots you created yourself.
+
+        :param str path: The file to read the snapshot from.
+        :raises ValueError: If the snapshot was made by an incompatible
+            version of this library.
+        :rtype: :class:`RDFProvider`
+        '''
+        with open(path, 'rb') as f:
+            version, state = pickle.load(f)
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(
+                'Snapshot %s has version %s, expected %s.' % (
+                    path, version, SNAPSHOT_VERSION)
+            )
+        provider = cls.__new__(cls)
+        provider.__dict__.update(state)
+        provider.graph = None
+        if provider.compact:
+            provider.list = provider._records_view()
+        return provider
+
+    @classmethod
+    def from_snapshot_cache(cls, metadata, files, cache_dir, format=None,
+                            key=None, **kwargs):
+        '''
+        Create a provider from one or more RDF files, using a snapshot when
+        one exists for the same files and arguments.
+
+        Snapshots are stored in `cache_dir`. They are named after a hash of
+        the paths of the files, the `format`, the `metadata` and the other
+        keyword arguments, followed by a hash of the content of the files.
+        When no snapshot matches, the files are parsed, the provider is built
+        and a snapshot is saved for the next time. Snapshots of older
+        versions of the same files are removed.
+
+        Arguments that can't be serialised to JSON, like a `uri_generator`
+        or a `concept_scheme`, can't be hashed reliably. They are only
+        accepted together with a `key` that identifies them, which needs to
+        change when they do.
+
+        :param dict metadata: A dictionary with keywords like language.
+        :param files: The path of an RDF file or a list of paths.
+        :param str cache_dir: The directory to keep the snapshots in.
+        :param str format: The format of the files. Guessed from the file
+            extension if not present.
+        :param str key: Identifies the arguments that can't be serialised to
+            JSON.
+        :raises ValueError: If a lazy provider is requested, since it can't
+            be saved to a snapshot, if a file is not given by its path or if
+            an argument can't be serialised to JSON and no `key` is given.
+        :rtype: :class:`RDFProvider`
+        '''
+        if kwargs.get('lazy'):
+            raise ValueError('A lazy RDFProvider can not be saved to a snapshot.')
+        if isinstance(files, (str, os.PathLike)):
+            files = [files]
+        if any(not isinstance(file, (str, os.PathLike)) for file in files):
+            raise ValueError('Only files given by their path can be cached.')
+        arguments = [
+            metadata,
+            {k: v for k, v in kwargs.items() if k != 'instrument'}
+        ]
+        unserialisable = sorted(
+            k for d in arguments for k, v in d.items() if not _serialisable(v)
+        )
+        if unserialisable and key is None:
+            raise ValueError(
+                'Pass a key to cache a provider built with %s, which can not '
+                'be serialised to JSON.' % ', '.join(unserialisable)
+            )
+        name = hashlib.sha256(json.dumps([
+            cls.__module__, cls.__qualname__, format, key,
+            [os.path.abspath(file) for file in files],
+            [{k: v for k, v in d.items() if _serialisable(v)} for d in arguments]
+        ], sort_keys=True).encode('utf-8')).hexdigest()
+        content = hashlib.sha256(str(SNAPSHOT_VERSION).encode('utf-8'))
+        for file in files:
+            with open(file, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    content.update(chunk)
+            content.update(b'\0')
+        snapshot = '%s-%s.snapshot' % (name, content.hexdigest())
+        path = os.path.join(cache_dir, snapshot)
+        if os.path.exists(path):
+            try:
+                return cls.load_snapshot(path)
+            except (ValueError, EOFError, pickle.UnpicklingError):
+                log.warning('Ignoring unreadable snapshot %s.' % path)
+        # Building the provider adds to the metadata, which would change the
+        # hash the next time the same dictionary is passed.
+        provider = cls.from_file(copy.deepcopy(metadata), files, format, **kwargs)
+        os.makedirs(cache_dir, exist_ok=True)
+        provider.dump_snapshot(path)
+        for other in os.listdir(cache_dir):
+            if other.startswith(name + '-') and other != snapshot:
+                try:
+                    os.remove(os.path.join(cache_dir, other))
+                except FileNotFoundError:
+                    pass
+        return provider
+
+    @classmethod
+    def for_schemes(cls, metadata, graph, **kwargs):
+        '''
+        Create a provider for every conceptscheme in a graph.
+
+        The graph is scanned once for the identifiers of all subjects and the
+        conceptscheme every concept and collection is part of. All providers
+        share this scan and the graph, so updating one of them can affect
+        the others.
+
+        :param dict metadata: The metadata of every provider, keyed by the
+            uri of its conceptscheme.
+        :param rdflib.graph.Graph graph: The graph to read the concepts and
+            collections from.
+        :raises RuntimeError: If a conceptscheme is not present in the graph.
+        :returns: A :class:`dict` of providers, keyed by the uri of their
+            conceptscheme.
+        '''
+        scan = {}
+        return {
+            uri: cls(
+                md, graph, concept_scheme_uri=uri, _scan=scan, **kwargs
+            ) for uri, md in metadata.items()
+        }
+
+    @classmethod
+    def from_file(cls, metadata, files, format=None, **kwargs):
+        '''
+        Create a provider from one or more RDF files.
+
+        Unlike parsing the files into an :class:`rdflib.graph.Graph` first,
+        only the triples the provider reads are kept while parsing: triples
+        with a SKOS, Dublin Core or skos-thes predicate and the `rdf:type`
+        triples with a SKOS or skos-thes type. This keeps the graph of the
+        provider, and the memory needed to build it, small when the files
+        contain a lot of other data.
+
+        :param dict metadata: A dictionary with keywords like language.
+        :param files: The RDF file to parse or a list of them. A file can be
+            a path or a file-like object.
+        :param str format: The format of the files. Guessed from the file
+            extension if not present.
+        :rtype: :class:`RDFProvider`
+        '''
+        return cls(metadata, _parse(files, format, rdflib.Graph(store=_SkosStore())), **kwargs)
+
+    def cache_stats(self):
+        '''
+        Get statistics about the caches of this provider.
+
+        :returns: A :class:`dict` with the hits and misses of the concepts and
+            collections built by a lazy or compact provider, the number of
+            concepts and collections :meth:`expand` has been computed for and
+            the hits and misses of the validation of languages, which is
+            shared by all providers.
+        '''
+        languages = _scrub_language.cache_info()
+        stats = {
+            'expand': len(self._expand_memo),
+            'language_cache_hits': languages.hits,
+            'language_cache_misses': languages.misses,
+        }
+        if isinstance(self.list, _LazyList):
+            stats.update(
+                object_cache_hits=self.list.hits,
+                object_cache_misses=self.list.misses,
+                object_cache_size=len(self.list._cache),
+            )
+        return stats
+
+    def _cs_from_graph(self, metadata, scan=None, **kwargs):
+        if scan is not None and 'concept_scheme_uri' in kwargs:
+            return self._cs_from_scan(scan, kwargs['concept_scheme_uri'])
+        cslist = [
+            self._create_concept_scheme(sub)
+            for sub in self.graph.subjects(RDF.type, SKOS.ConceptScheme)
+        ]
         if len(cslist) == 0:
             return ConceptScheme(
                 uri=DefaultConceptSchemeUrnGenerator().generate(
@@ -97,59 +663,688 @@ class RDFProvider(MemoryProvider):
                 else:
                     return filteredcslist[0]
 
-    def _from_graph(self):
-        clist = []
-        for sub, pred, obj in self.graph.triples((None, RDF.type, SKOS.Concept)):
-            if self.check_in_scheme and self._get_in_scheme(sub) != self.concept_scheme.uri:
-                continue
-            uri = self.to_text(sub)
-            matches = {}
-            for k in Concept.matchtypes:
-                matches[k] = self._create_from_subject_predicate(
-                    sub, URIRef(SKOS[k + 'Match']))
-            con = Concept(
-                id=self._get_id_for_subject(sub, uri),
-                uri=uri,
-                concept_scheme=self.concept_scheme,
-                labels=self._create_from_subject_typelist(
-                    sub, self._scrub_label_types()),
-                notes=self._create_from_subject_typelist(
-                    sub, Note.valid_types),
-                sources=self._create_sources(sub),
-                broader=self._create_from_subject_predicate(sub, SKOS.broader),
-                narrower=self._create_from_subject_predicate(
-                    sub, SKOS.narrower),
-                related=self._create_from_subject_predicate(sub, SKOS.related),
-                member_of=[],
-                subordinate_arrays=self._create_from_subject_predicate(
-                    sub, SKOS_THES.subordinateArray),
-                matches=matches
-            )
-            clist.append(con)
+    def _create_concept_scheme(self, sub):
+        return ConceptScheme(
+            uri=self.to_text(sub),
+            labels=self._create_from_subject_typelist(
+                sub, self._scrub_label_types()),
+            notes=self._create_from_subject_typelist(
+                sub, Note.valid_types),
+            sources=self._create_sources(sub),
+            languages=self._create_languages(sub)
+        )
 
-        for sub, pred, obj in self.graph.triples((None, RDF.type, SKOS.Collection)):
-            if self.check_in_scheme and self._get_in_scheme(sub) != self.concept_scheme.uri:
-                continue
-            uri = self.to_text(sub)
-            col = Collection(
-                id=self._get_id_for_subject(sub, uri),
-                uri=uri,
-                concept_scheme=self.concept_scheme,
-                labels=self._create_from_subject_typelist(
-                    sub, self._scrub_label_types()),
-                notes=self._create_from_subject_typelist(
-                    sub, (Note.valid_types)),
-                sources=self._create_sources(sub),
-                members=self._create_from_subject_predicate(sub, SKOS.member),
-                member_of=[],
-                superordinates=self._create_from_subject_predicate(
-                    sub, SKOS_THES.superOrdinate)
+    def _cs_from_scan(self, scan, csuri):
+        '''
+        Create the conceptscheme of a provider built by :meth:`for_schemes`,
+        without creating the other conceptschemes in the graph.
+        '''
+        if 'schemes' not in scan:
+            scan['schemes'] = [
+                self.to_text(sub)
+                for sub in self.graph.subjects(RDF.type, SKOS.ConceptScheme)
+            ]
+        if csuri not in scan['schemes']:
+            raise RuntimeError(
+                'This RDF file does not contain ConceptScheme %s. The \
+                following schemes were found: %s' % (
+                    csuri, ", ".join(scan['schemes']))
             )
-            clist.append(col)
+        self.check_in_scheme = len(scan['schemes']) > 1
+        return self._create_concept_scheme(URIRef(csuri))
+
+    def _from_graph(self, scan=None, stages=_NO_STAGES):
+        '''
+        :param dict scan: The scan shared by the providers built by
+            :meth:`for_schemes`. The records of all subjects and the
+            conceptscheme they are part of are kept in it.
+        :param stages: Reports the stages of building the provider.
+        '''
+        if scan is None:
+            scan = {}
+        if 'records' not in scan:
+            scan['records'] = _GroupedRecords(
+                self.graph, self._record_predicates())
+            scan['subjects'] = self._partition_subjects(scan['records'])
+            if stages.enabled:
+                stages.done(
+                    'records', subjects=len(scan['records'].records),
+                    triples=sum(
+                        len(objects)
+                        for record in scan['records'].records.values()
+                        for objects in record.values()
+                    )
+                )
+        records = scan['records']
+        subjects = scan['subjects'].get(
+            self.concept_scheme.uri if self.check_in_scheme else None, []
+        )
+        clist = [
+            self._create_collection(sub, records) if is_collection
+            else self._create_concept(sub, records)
+            for sub, is_collection in subjects
+        ]
+        stages.done('build', objects=len(clist))
         self._fill_member_of(clist)
+        stages.done('member_of')
         self._set_infer_concept_relations(clist)
+        stages.done('infer')
         return clist
 
+    def _partition_subjects(self, records):
+        '''
+        Partition the subjects of all concepts and collections by the
+        conceptscheme they are part of, in one pass over the graph.
+
+        :returns: A :class:`dict` of lists of subjects and whether they are a
+            collection, keyed by the uri of their conceptscheme. All subjects
+            are kept under `None` as well.
+        '''
+        partition = {None: []}
+        for type in (SKOS.Concept, SKOS.Collection):
+            for sub in self.graph.subjects(RDF.type, type):
+                item = (sub, type == SKOS.Collection)
+                partition[None].append(item)
+                scheme = self._get_in_scheme_from_record(records.record(sub))
+                if scheme is not None:
+                    partition.setdefault(scheme, []).append(item)
+        return partition
+
+    def _index_graph(self, cache_size=None):
+        '''
+        Index the subjects of all concepts and collections and their
+        identifiers, without building them.
+
+        :param int cache_size: Maximum number of concepts and collections
+            to keep once they are built.
+        :rtype: :class:`_LazyList`
+        '''
+        self._subject_records = _SubjectRecords(
+            self.graph, self._record_predicates())
+        self._lazy_subjects = []
+        self._ids = {}
+        self._uris = {}
+        self._lazy_collections = {}
+        for type in (SKOS.Concept, SKOS.Collection):
+            for sub in self.graph.subjects(RDF.type, type):
+                if self.check_in_scheme and self._get_in_scheme(sub) != self.concept_scheme.uri:
+                    continue
+                uri = self.to_text(sub)
+                id = self._get_id_for_subject(sub, uri)
+                i = len(self._lazy_subjects)
+                self._lazy_subjects.append((sub, type, id))
+                self._ids.setdefault(str(id), i)
+                self._uris.setdefault(uri, i)
+                if type == SKOS.Collection:
+                    self._lazy_collections[sub] = i
+        return _LazyList(self._materialize, len(self._lazy_subjects), cache_size)
+
+    def _materialize(self, i):
+        '''
+        Build a concept or collection that was indexed by
+        :meth:`_index_graph`, including its `member_of` and
+        `infer_concept_relations` attributes.
+
+        :param int i: Position of the concept or collection in the index.
+        '''
+        sub, type, id = self._lazy_subjects[i]
+        if type == SKOS.Concept:
+            c = self._create_concept(sub, self._subject_records)
+        else:
+            c = self._create_collection(sub, self._subject_records)
+            c.infer_concept_relations = self._lazy_infer_concept_relations(c)
+        positions = sorted(
+            self._lazy_collections[col]
+            for col in self.graph.subjects(SKOS.member, sub)
+            if col in self._lazy_collections
+        )
+        c.member_of = [self._lazy_subjects[p][2] for p in positions]
+        return c
+
+    def _lazy_infer_concept_relations(self, collection):
+        '''
+        Determine if a collection that is being materialized should infer
+        concept relations, without building its members.
+
+        :param collection: A :class:`skosprovider.skos.Collection`.
+        :rtype: Boolean
+        '''
+        if not collection.superordinates:
+            return False
+        superordinates = set(collection.superordinates)
+        seen = set()
+        todo = list(collection.members)
+        while todo:
+            i = self._ids.get(str(todo.pop()))
+            if i is None or i in seen:
+                continue
+            seen.add(i)
+            sub, type, id = self._lazy_subjects[i]
+            if type == SKOS.Concept:
+                broader = self._create_from_record(
+                    self._subject_records.record(sub, (SKOS.broader,)),
+                    SKOS.broader, self._subject_records
+                )
+                if superordinates.intersection(broader):
+                    return True
+            else:
+                todo.extend(self._create_from_record(
+                    self._subject_records.record(sub, (SKOS.member,)),
+                    SKOS.member, self._subject_records
+                ))
+        return False
+
+    def _index_list(self):
+        '''
+        Index the positions of all concepts and collections in the list by
+        their id and uri.
+
+        Ids are indexed as strings, so an id can be looked up as an integer
+        or a string. When more than one item has the same id or uri, the
+        first one is used.
+        '''
+        self._ids = {}
+        self._uris = {}
+        for i, c in enumerate(self.list):
+            self._ids.setdefault(str(c.id), i)
+            self._uris.setdefault(str(c.uri), i)
+
+    def _index_item(self, i, c):
+        self._ids.setdefault(str(c.id), i)
+        self._uris.setdefault(str(c.uri), i)
+        if self._label_index is not None:
+            for gram in self._label_grams(c):
+                self._label_index.setdefault(gram, []).append(i)
+
+    def _unindex_item(self, i, c):
+        for index, key in ((self._ids, str(c.id)), (self._uris, str(c.uri))):
+            if index.get(key) == i:
+                del index[key]
+        if self._label_index is not None:
+            for gram in self._label_grams(c):
+                postings = self._label_index.get(gram, [])
+                if i in postings:
+                    postings.remove(i)
+                if not postings:
+                    self._label_index.pop(gram, None)
+
+    def update(self, added=(), removed=()):
+        '''
+        Add and remove triples from the graph and update the concepts and
+        collections they describe.
+
+        :param added: Triples to add to the graph.
+        :param removed: Triples to remove from the graph.
+        '''
+        self._check_updatable()
+        subjects = set()
+        for triple in removed:
+            self.graph.remove(triple)
+            subjects.add(triple[0])
+        for triple in added:
+            self.graph.add(triple)
+            subjects.add(triple[0])
+        self.refresh(subjects)
+
+    def refresh(self, subjects):
+        '''
+        Build the concepts and collections for subjects that changed in the
+        graph again, without reloading the entire graph.
+
+        Concepts and collections that no longer exist are removed and new
+        ones are added. The `member_of` and `infer_concept_relations`
+        attributes that depend on the changed subjects and all indexes are
+        updated as well. Removing a concept or collection moves the last one
+        in the list to its position.
+
+        :param subjects: The subjects that changed. Blank nodes representing
+            a source update the subjects they are a source of.
+        :raises ValueError: If this is a lazy provider or a provider without
+            a graph.
+        :raises RuntimeError: If a changed concept or collection has more
+            than one identifier.
+        '''
+        self._check_updatable()
+        subjects = set(subjects)
+        for s in list(subjects):
+            if isinstance(s, BNode):
+                subjects.update(self.graph.subjects(DCTERMS.source, s))
+        subjects = {s for s in subjects if isinstance(s, URIRef)}
+        for s in list(subjects):
+            old = self._identifiers.get(s)
+            if self._index_identifier(s) != old:
+                subjects.update(
+                    r for r in self.graph.subjects(None, s)
+                    if isinstance(r, URIRef)
+                )
+        conflicts = sorted(
+            str(s) for s in subjects if s in self._identifier_conflicts
+        )
+        if conflicts:
+            raise RuntimeError(
+                'The following concepts or collections have more than one '
+                'identifier: %s' % ", ".join(conflicts)
+            )
+        records = _SubjectRecords(self.graph, self._record_predicates())
+        members = set()
+        collections = set()
+        for s in sorted(subjects):
+            i = self._uris.get(str(s))
+            old = None if i is None else self.list[i]
+            new = self._create_subject(s, records)
+            for c in (old, new):
+                if isinstance(c, Collection):
+                    members.update(str(m) for m in c.members)
+                    collections.add(str(c.id))
+            if old is not None:
+                collections.update(str(col) for col in old.member_of)
+                self._unindex_item(i, old)
+                if new is None:
+                    last = len(self.list) - 1
+                    if i != last:
+                        self._unindex_item(last, self.list[last])
+                        self.list[i] = self.list[last]
+                        self._index_item(i, self.list[i])
+                    self.list.pop()
+            if new is not None:
+                members.add(str(new.id))
+                if i is None:
+                    i = len(self.list)
+                    self.list.append(new)
+                else:
+                    self.list[i] = new
+                self._index_item(i, new)
+        for id in members:
+            c = self.get_by_id(id)
+            if not c:
+                continue
+            positions = []
+            for col in self.graph.subjects(SKOS.member, URIRef(c.uri)):
+                i = self._uris.get(str(col))
+                if i is not None and isinstance(self.list[i], Collection):
+                    positions.append(i)
+            c.member_of = [self.list[i].id for i in sorted(positions)]
+            collections.update(str(col) for col in c.member_of)
+        todo = list(collections)
+        dirty = []
+        while todo:
+            col = self.get_by_id(todo.pop())
+            if not isinstance(col, Collection):
+                continue
+            dirty.append(col)
+            for parent in col.member_of:
+                if str(parent) not in collections:
+                    collections.add(str(parent))
+                    todo.append(str(parent))
+        self._set_infer_concept_relations(dirty, self.get_by_id)
+        self._declared_top_concepts = self._get_declared_top_concepts()
+        self._reset_hierarchy()
+
+    def _check_updatable(self):
+        if self.lazy:
+            raise ValueError('A lazy RDFProvider can not be updated.')
+        if self.compact:
+            raise ValueError('A compact RDFProvider can not be updated.')
+        if self.graph is None:
+            raise ValueError('An RDFProvider without a graph can not be updated.')
+
+    def _create_subject(self, sub, records):
+        '''
+        Create the concept or collection a subject represents.
+
+        :returns: A :class:`skosprovider.skos.Concept`,
+            :class:`skosprovider.skos.Collection` or `None` if the subject is
+            not a concept or collection of this provider.
+        '''
+        if self.check_in_scheme and self._get_in_scheme(sub) != self.concept_scheme.uri:
+            return None
+        if (sub, RDF.type, SKOS.Concept) in self.graph:
+            return self._create_concept(sub, records)
+        if (sub, RDF.type, SKOS.Collection) in self.graph:
+            return self._create_collection(sub, records)
+        return None
+
+    def _normalise_label(self, label):
+        return label.upper() if self.case_insensitive else label
+
+    def _index_labels(self):
+        '''
+        Index the positions of all concepts and collections in the list by
+        the n-grams of their labels.
+
+        A label search matches every label that contains the query, so the
+        concepts and collections that can match are those that have all
+        n-grams of the query in one of their labels. Labels are normalised
+        the same way :meth:`find` compares them.
+        '''
+        self._label_index = {}
+        self._label_index_case_insensitive = self.case_insensitive
+        for i, c in enumerate(self.list):
+            for gram in self._label_grams(c):
+                self._label_index.setdefault(gram, []).append(i)
+
+    def _label_grams(self, c):
+        grams = set()
+        for label in c.labels:
+            text = self._normalise_label(label.label)
+            grams.update(
+                text[j:j + LABEL_NGRAM]
+                for j in range(len(text) - LABEL_NGRAM + 1)
+            )
+        return grams
+
+    def _find_label_candidates(self, label):
+        '''
+        Find the positions of the concepts and collections that can have a
+        label matching a query.
+
+        :param str label: The label to search for.
+        :returns: A sorted :class:`list` of positions or `None` when the index
+            can not be used for this query.
+        '''
+        if self._label_index is None or \
+                self._label_index_case_insensitive != self.case_insensitive:
+            return None
+        text = self._normalise_label(label)
+        if len(text) < LABEL_NGRAM:
+            return None
+        postings = sorted(
+            (self._label_index.get(text[j:j + LABEL_NGRAM], ())
+             for j in range(len(text) - LABEL_NGRAM + 1)),
+            key=len
+        )
+        return sorted(set(postings[0]).intersection(*postings[1:]))
+
+    def find(self, query, **kwargs):
+        candidates = None
+        if 'label' in query:
+            candidates = self._find_label_candidates(query['label'])
+        if candidates is None:
+            return super().find(query, **kwargs)
+        query = self._normalise_query(query)
+        filtered = [
+            c for c in map(self.list.__getitem__, candidates)
+            if self._include_in_find(c, query)
+        ]
+        language = self._get_language(**kwargs)
+        sort = self._get_sort(**kwargs)
+        reverse_sort = self._get_sort_order(**kwargs) == "desc"
+        return [
+            self._get_find_dict(c, **kwargs)
+            for c in self._sort(filtered, sort, language, reverse_sort)
+        ]
+
+    def _get_declared_top_concepts(self):
+        '''
+        Find the top concepts of the conceptscheme declared in the graph
+        through `skos:hasTopConcept` or `skos:topConceptOf`.
+
+        :returns: A sorted :class:`list` of positions in the list.
+        '''
+        scheme = URIRef(self.concept_scheme.uri)
+        subjects = set(self.graph.objects(scheme, SKOS.hasTopConcept))
+        subjects.update(self.graph.subjects(SKOS.topConceptOf, scheme))
+        return sorted(
+            self._uris[str(s)] for s in subjects if str(s) in self._uris
+        )
+
+    def _reset_hierarchy(self):
+        '''
+        Forget everything that was derived from the hierarchy, so it is
+        computed again on first use.
+        '''
+        self._expand_memo = {}
+        self._higher_memo = {}
+        self._top_concepts = None
+        self._top_display = None
+
+    def expand(self, id):
+        '''
+        Expand a concept or collection to all concepts below it.
+
+        The result for every concept and collection is kept after it is
+        computed, so a second call for the same or a narrower concept is a
+        lookup.
+        '''
+        if str(id) not in self._ids:
+            return False
+
+        def _children(id):
+            c = self.get_by_id(id)
+            if isinstance(c, Concept):
+                return [str(n) for n in c.narrower] + [
+                    str(s) for s in c.subordinate_arrays
+                    if getattr(self.get_by_id(s), 'infer_concept_relations', False)
+                ]
+            elif isinstance(c, Collection):
+                return [str(m) for m in c.members]
+            return ()
+
+        def _concept(id):
+            c = self.get_by_id(id)
+            return (c.id,) if isinstance(c, Concept) else ()
+
+        return list(
+            _reachable_union(str(id), _children, _concept, self._expand_memo)
+        )
+
+    def _is_top_concept(self, c, memo=None):
+        '''
+        :param dict memo: Memo for the collections above a concept. Defaults
+            to the memo of this provider.
+        '''
+        if memo is None:
+            memo = self._higher_memo
+        if not isinstance(c, Concept):
+            return False
+        if len(c.broader):
+            return False
+
+        def _parents(id):
+            coll = self.get_by_id(id)
+            if coll and coll.infer_concept_relations:
+                return [str(p) for p in coll.member_of]
+            return ()
+
+        def _superordinates(id):
+            coll = self.get_by_id(id)
+            if coll and coll.infer_concept_relations and coll.superordinates:
+                return (True,)
+            return ()
+
+        return not any(
+            _reachable_union(str(collid), _parents, _superordinates, memo)
+            for collid in c.member_of
+        )
+
+    def get_top_concepts(self, **kwargs):
+        '''
+        Get the top concepts of the conceptscheme.
+
+        When the graph declares top concepts through `skos:hasTopConcept` or
+        `skos:topConceptOf`, those are returned. Otherwise the top concepts
+        are the concepts without a broader concept. Their positions in the
+        list are determined once and kept, so a lazy or compact provider
+        still only keeps `cache_size` concepts built.
+        '''
+        if self._top_concepts is None:
+            if self._declared_top_concepts:
+                self._top_concepts = [
+                    i for i in self._declared_top_concepts
+                    if isinstance(self.list[i], Concept)
+                ]
+            else:
+                self._top_concepts = [
+                    i for i, c in enumerate(self.list)
+                    if self._is_top_concept(c)
+                ]
+        language = self._get_language(**kwargs)
+        sort = self._get_sort(**kwargs)
+        reverse_sort = self._get_sort_order(**kwargs) == "desc"
+        top = [self.list[i] for i in self._top_concepts]
+        return [
+            self._get_find_dict(concept, **kwargs)
+            for concept in self._sort(top, sort, language, reverse_sort)
+        ]
+
+    def get_top_display(self, **kwargs):
+        if self._top_display is None:
+            self._top_display = [
+                i for i, c in enumerate(self.list)
+                if (
+                    isinstance(c, Concept)
+                    and len(c.broader) == 0 and len(c.member_of) == 0
+                ) or (
+                    isinstance(c, Collection)
+                    and len(c.superordinates) == 0 and len(c.member_of) == 0
+                )
+            ]
+        return self._get_display_dicts(
+            [self.list[i] for i in self._top_display], **kwargs
+        )
+
+    def _get_display_dicts(self, items, **kwargs):
+        language = self._get_language(**kwargs)
+        sort = self._get_sort(**kwargs)
+        sort_order = self._get_sort_order(**kwargs)
+        return [
+            {
+                "id": c.id,
+                "uri": c.uri,
+                "type": c.type,
+                "label": None if c.label() is None else c.label(language).label,
+            }
+            for c in self._sort(items, sort, language, sort_order == "desc")
+        ]
+
+    def get_by_id(self, id):
+        i = self._ids.get(str(id))
+        return False if i is None else self.list[i]
+
+    def get_by_uri(self, uri):
+        i = self._uris.get(str(uri))
+        return False if i is None else self.list[i]
+
+    def _record_predicates(self):
+        '''
+        All predicates needed to build a concept or a collection.
+
+        :returns: A :class:`list` of :class:`rdflib.term.URIRef` predicates.
+        '''
+        return (
+            [SKOS[t] for t in self._scrub_label_types()] +
+            [SKOS[t] for t in Note.valid_types] +
+            [URIRef(SKOS[k + 'Match']) for k in Concept.matchtypes] +
+            [
+                SKOS.broader, SKOS.narrower, SKOS.related, SKOS.member,
+                SKOS.inScheme, SKOS.topConceptOf,
+                SKOS_THES.subordinateArray, SKOS_THES.superOrdinate,
+                DCTERMS.source, DCTERMS.bibliographicCitation,
+            ]
+        )
+
+    def _create_concept(self, sub, records):
+        '''
+        Create a concept from the records of a subject.
+
+        :param sub: The subject representing the concept.
+        :param records: A :class:`_GroupedRecords` or :class:`_SubjectRecords`
+            instance.
+        :rtype: :class:`skosprovider.skos.Concept`
+        '''
+        record = records.record(sub)
+        uri = self.to_text(sub)
+        matches = {}
+        for k in Concept.matchtypes:
+            matches[k] = self._create_from_record(
+                record, URIRef(SKOS[k + 'Match']), records)
+        return Concept(
+            id=self._get_id_for_subject(sub, uri),
+            uri=uri,
+            concept_scheme=self.concept_scheme,
+            labels=self._create_from_record_typelist(
+                record, self._scrub_label_types(), records),
+            notes=self._create_from_record_typelist(
+                record, Note.valid_types, records),
+            sources=self._create_sources_from_record(record, records),
+            broader=self._create_from_record(record, SKOS.broader, records),
+            narrower=self._create_from_record(record, SKOS.narrower, records),
+            related=self._create_from_record(record, SKOS.related, records),
+            member_of=[],
+            subordinate_arrays=self._create_from_record(
+                record, SKOS_THES.subordinateArray, records),
+            matches=matches
+        )
+
+    def _create_collection(self, sub, records):
+        '''
+        Create a collection from the records of a subject.
+
+        :param sub: The subject representing the collection.
+        :param records: A :class:`_GroupedRecords` or :class:`_SubjectRecords`
+            instance.
+        :rtype: :class:`skosprovider.skos.Collection`
+        '''
+        record = records.record(sub)
+        uri = self.to_text(sub)
+        return Collection(
+            id=self._get_id_for_subject(sub, uri),
+            uri=uri,
+            concept_scheme=self.concept_scheme,
+            labels=self._create_from_record_typelist(
+                record, self._scrub_label_types(), records),
+            notes=self._create_from_record_typelist(
+                record, Note.valid_types, records),
+            sources=self._create_sources_from_record(record, records),
+            members=self._create_from_record(record, SKOS.member, records),
+            member_of=[],
+            superordinates=self._create_from_record(
+                record, SKOS_THES.superOrdinate, records)
+        )
+
+    def _get_in_scheme_from_record(self, record):
+        '''
+        Determine the scheme a subject is part of based on its record.
+
+        :param dict record: The record of the subject.
+        :returns: A URI for the scheme a subject is part of or None if
+            it's not part of a scheme.
+        '''
+        scheme = record.get(SKOS.inScheme) or record.get(SKOS.topConceptOf)
+        return self.to_text(scheme[0]) if scheme else None
+
+    def _create_from_record_typelist(self, record, typelist, records):
+        list = []
+        for p in typelist:
+            list.extend(self._create_from_record(record, SKOS[p], records))
+        return list
+
+    def _create_from_record(self, record, predicate, records):
+        type = predicate.split('#')[-1]
+        list = []
+        for o in record.get(predicate, ()):
+            if Label.is_valid_type(type):
+                o = self._create_label(o, type)
+            elif Note.is_valid_type(type):
+                o = self._create_note(o, type)
+            else:
+                o = self._get_id_for_subject(o, self.to_text(o))
+            list.append(o)
+        return list
+
+    def _create_sources_from_record(self, record, records):
+        ret = []
+        for o in record.get(DCTERMS.source, ()):
+            citations = records.record(o, (DCTERMS.bibliographicCitation,))
+            for oi in citations.get(DCTERMS.bibliographicCitation, ()):
+                ret.append(
+                    Source(
+                        self.to_text(oi),
+                        'HTML' if oi.datatype == RDF.HTML else None
+                    )
+                )
+        return ret
+
     def _get_in_scheme(self, subject):
         '''
         Determine if a subject is part of a scheme.
@@ -164,38 +1359,138 @@ class RDFProvider(MemoryProvider):
             scheme = self.graph.value(subject, SKOS.topConceptOf)
         return self.to_text(scheme) if scheme else None
 
+    def _compact_list(self, clist, cache_size=0):
+        '''
+        Replace the concepts and collections by compact records.
+
+        Every concept and collection is stored as a tuple of tuples with the
+        strings that repeat between them, like ids, uris, types and
+        languages, interned. Concepts and collections are built from these
+        records again when they are requested.
+
+        :param list clist: The concepts and collections to compact.
+        :param int cache_size: The maximum number of concepts and collections
+            to keep once they are built again.
+        :returns: A :class:`_LazyList` of the concepts and collections.
+        '''
+        self._records = [self._encode(c) for c in clist]
+        self._records_cache_size = cache_size
+        return self._records_view()
+
+    def _records_view(self):
+        return _LazyList(
+            self._decode, len(self._records), self._records_cache_size
+        )
+
+    def _encode(self, c):
+        record = (
+            isinstance(c, Collection),
+            _intern(c.id),
+            _intern(c.uri),
+            tuple(
+                (l.label, _intern(l.type), _intern(l.language))
+                for l in c.labels
+            ),
+            tuple(
+                (n.note, _intern(n.type), _intern(n.language),
+                 _intern(n.markup))
+                for n in c.notes
+            ),
+            tuple((s.citation, _intern(s.markup)) for s in c.sources),
+            _interned(c.member_of),
+        )
+        if isinstance(c, Collection):
+            return record + (
+                _interned(c.members),
+                _interned(c.superordinates),
+                c.infer_concept_relations,
+            )
+        return record + (
+            _interned(c.broader),
+            _interned(c.narrower),
+            _interned(c.related),
+            _interned(c.subordinate_arrays),
+            tuple((k, _interned(v)) for k, v in c.matches.items() if v),
+        )
+
+    def _decode(self, i):
+        record = self._records[i]
+        kwargs = {
+            'id': record[1],
+            'uri': record[2],
+            'concept_scheme': self.concept_scheme,
+            'labels': [
+                _restore(
+                    Label, label=l, type=t, language=lang, uri=None,
+                    label_types=[]
+                ) for l, t, lang in record[3]
+            ],
+            'notes': [
+                _restore(Note, note=n, type=t, language=lang, markup=m)
+                for n, t, lang, m in record[4]
+            ],
+            'sources': [Source(c, m) for c, m in record[5]],
+            'member_of': list(record[6]),
+        }
+        if record[0]:
+            return Collection(
+                members=list(record[7]),
+                superordinates=list(record[8]),
+                infer_concept_relations=record[9],
+                **kwargs
+            )
+        matches = {k: [] for k in Concept.matchtypes}
+        matches.update((k, list(v)) for k, v in record[11])
+        return Concept(
+            broader=list(record[7]),
+            narrower=list(record[8]),
+            related=list(record[9]),
+            subordinate_arrays=list(record[10]),
+            matches=matches,
+            **kwargs
+        )
+
     def _fill_member_of(self, clist):
-        collections = list({c for c in clist if isinstance(c, Collection)})
-        for col in collections:
-            for c in clist:
-                if c.id in col.members:
-                    c.member_of.append(col.id)
+        member_of = {}
+        for col in clist:
+            if isinstance(col, Collection):
+                for m in dict.fromkeys(col.members):
+                    member_of.setdefault(m, []).append(col.id)
+        for c in clist:
+            c.member_of.extend(member_of.get(c.id, []))
         return
 
-    def _set_infer_concept_relations(self, clist):
-        collections = list({c for c in clist if isinstance(c, Collection)})
-        for col in collections:
+    def _set_infer_concept_relations(self, clist, get=None):
+        '''
+        :param list clist: The concepts and collections to determine
+            `infer_concept_relations` for.
+        :param get: Callable to look up a concept or collection by id.
+            Defaults to looking them up in `clist`.
+        '''
+        if get is None:
+            items = {}
+            for c in clist:
+                items.setdefault(c.id, c)
+            get = items.get
+
+        def _members(id):
+            c = get(id)
+            return c.members if isinstance(c, Collection) else ()
+
+        def _broader(id):
+            c = get(id)
+            return c.broader if isinstance(c, Concept) else ()
+
+        memo = {}
+        for col in clist:
+            if not isinstance(col, Collection):
+                continue
             if not col.superordinates:
                 col.infer_concept_relations = False
                 continue
-
-            def _collect_broader(collection, clist):
-                '''
-                Collect all broader concepts of members of a collection or
-                their (recursive) members.
-                '''
-                members = list(
-                    {c for c in clist if c.id in collection.members})
-                broader = []
-                for m in members:
-                    if m.type == 'concept':
-                        broader.extend(m.broader)
-                    elif m.type == 'collection':
-                        broader.extend(_collect_broader(m, clist))
-                return broader
-            broader = _collect_broader(col, clist)
-            col.infer_concept_relations = len(
-                set(broader).intersection(col.superordinates)) > 0
+            broader = _reachable_union(col.id, _members, _broader, memo)
+            col.infer_concept_relations = not broader.isdisjoint(
+                col.superordinates)
 
     def _create_from_subject_typelist(self, subject, typelist):
         list = []
@@ -204,13 +1499,66 @@ class RDFProvider(MemoryProvider):
             list.extend(self._create_from_subject_predicate(subject, term))
         return list
 
+    def _index_identifiers(self):
+        '''
+        Index the identifiers of all subjects in the graph.
+
+        A `dcterms:identifier` takes precedence over a `dc:identifier`. All
+        concepts and collections with more than one identifier are reported
+        at once. Other subjects with more than one identifier only raise an
+        error when their identifier is needed.
+
+        :raises RuntimeError: If one or more concepts or collections have
+            more than one identifier.
+        '''
+        self._identifiers = {}
+        self._identifier_conflicts = {}
+        for p in reversed(IDENTIFIER_PREDICATES):
+            found = {}
+            for s, o in self.graph.subject_objects(p):
+                found.setdefault(s, []).append(o)
+            for s, values in found.items():
+                self._identifiers[s] = self.to_text(values[0])
+                if len(values) > 1:
+                    self._identifier_conflicts[s] = values
+                else:
+                    self._identifier_conflicts.pop(s, None)
+        conflicts = [
+            s for s in self._identifier_conflicts
+            if (s, RDF.type, SKOS.Concept) in self.graph
+            or (s, RDF.type, SKOS.Collection) in self.graph
+        ]
+        if conflicts:
+            raise RuntimeError(
+                'The following concepts or collections have more than one '
+                'identifier: %s' % ", ".join(
+                    '%s (%s)' % (s, ", ".join(sorted(
+                        self.to_text(v) for v in self._identifier_conflicts[s]
+                    ))) for s in sorted(conflicts)
+                )
+            )
+
+    def _index_identifier(self, subject):
+        '''
+        Index the identifier of a single subject again.
+
+        :returns: The identifier or `None` if the subject has none.
+        '''
+        self._identifiers.pop(subject, None)
+        self._identifier_conflicts.pop(subject, None)
+        for p in IDENTIFIER_PREDICATES:
+            values = list(self.graph.objects(subject, p))
+            if values:
+                self._identifiers[subject] = self.to_text(values[0])
+                if len(values) > 1:
+                    self._identifier_conflicts[subject] = values
+                break
+        return self._identifiers.get(subject)
+
     def _get_id_for_subject(self, subject, uri):
-        if (subject, DCTERMS.identifier, None) in self.graph:
-            return self.to_text(self.graph.value(subject=subject, predicate=DCTERMS.identifier, any=False))
-        elif (subject, DC.identifier, None) in self.graph:
-            return self.to_text(self.graph.value(subject=subject, predicate=DC.identifier, any=False))
-        else:
-            return uri
+        if subject in self._identifier_conflicts:
+            raise UniquenessError(self._identifier_conflicts[subject])
+        return self._identifiers.get(subject, uri)
 
     def _create_from_subject_predicate(self, subject, predicate):
         list = []
@@ -230,18 +1578,18 @@ class RDFProvider(MemoryProvider):
             raise ValueError(
                 'Type of Label is not valid.'
             )
-        return Label(self.to_text(literal), type, self._get_language_from_literal(literal))
+        # The language has been validated by _scrub_language already.
+        return _restore(
+            Label, label=self.to_text(literal), type=type,
+            language=self._get_language_from_literal(literal) or 'und',
+            uri=None, label_types=[]
+        )
 
     def _read_markupped_literal(self, literal):
         if literal.datatype == RDF.HTML:
-            df = literal.value.cloneNode(True)
-            if df.firstChild and df.firstChild.attributes and 'xml:lang' in df.firstChild.attributes.keys():
-                lang = self._scrub_language(
-                    df.firstChild.attributes.get('xml:lang').value)
-                del df.firstChild.attributes['xml:lang']
-            else:
-                lang = 'und'
-            return(df.toxml(), lang, 'HTML')
+            html, lang = _read_html(literal)
+            lang = 'und' if lang is None else self._scrub_language(lang)
+            return (html, lang, 'HTML')
         else:
             return (literal, self._get_language_from_literal(literal), None)
 
@@ -251,7 +1599,11 @@ class RDFProvider(MemoryProvider):
                 'Type of Note is not valid.'
             )
         l = self._read_markupped_literal(literal)
-        return Note(self.to_text(l[0]), type, l[1], l[2])
+        # The language has been validated by _scrub_language already.
+        return _restore(
+            Note, note=self.to_text(l[0]), type=type,
+            language=l[1] or 'und', markup=l[2]
+        )
 
     def _create_sources(self, subject):
         '''
@@ -280,18 +1632,13 @@ class RDFProvider(MemoryProvider):
         '''
         ret = set()
         for s, p, o in self.graph.triples((subject, DCTERMS.language, None)):
-            ret.add(self.to_text(self._scrub_language(o)))
+            ret.add(self._scrub_language(o))
         for s, p, o in self.graph.triples((subject, DC.language, None)):
-            ret.add(self.to_text(self._scrub_language(o)))
+            ret.add(self._scrub_language(o))
         return ret
 
     def _scrub_language(self, language):
-        if tags.check(language):
-            return language
-        else:
-            log.warning(
-                'Encountered an invalid language %s. Falling back to "und".' % language)
-            return 'und'
+        return _scrub_language(self.to_text(language))
 
     def _scrub_label_types(self):
         valid_label_types = Label.valid_types[:]
@@ -302,7 +1649,7 @@ class RDFProvider(MemoryProvider):
     def _get_language_from_literal(self, data):
         if not hasattr(data, 'language') or data.language is None:
             return None
-        return self.to_text(self._scrub_language(data.language))
+        return self._scrub_language(data.language)
 
     def to_text(self, data):
         """
@@ -311,3 +1658,370 @@ class RDFProvider(MemoryProvider):
         :return: text representation of the data
         """
         return text_(data.encode('utf-8'), 'utf-8')
+
+
+_QUERIES = {
+    'find_id': '''
+        SELECT DISTINCT ?s WHERE {
+            VALUES ?p { dcterms:identifier dc:identifier }
+            ?s ?p ?id .
+            FILTER(STR(?id) = STR(?q))
+        }
+    ''',
+}
+'''
+SPARQL queries used by :class:`QueryRDFProvider`.
+'''
+
+
+@functools.lru_cache(maxsize=None)
+def _prepared_query(name):
+    '''
+    Prepare one of the :data:`_QUERIES` the first time it is needed, so the
+    SPARQL parser is only loaded when it is used.
+    '''
+    from rdflib.plugins.sparql import prepareQuery
+    return prepareQuery(
+        _QUERIES[name],
+        initNs={'skos': SKOS, 'dcterms': DCTERMS, 'dc': DC}
+    )
+
+
+class _QueryList(Sequence):
+    '''
+    A read-only list of all concepts and collections of a
+    :class:`QueryRDFProvider`, built every time the list is iterated.
+    '''
+
+    def __init__(self, provider):
+        self._provider = provider
+
+    def __len__(self):
+        return sum(1 for s in self._provider._subjects())
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return list(self)[i]
+        if i < 0:
+            i += len(self)
+        for j, c in enumerate(self):
+            if j == i:
+                return c
+        raise IndexError('list index out of range')
+
+    def __iter__(self):
+        for sub, is_collection in self._provider._subjects():
+            yield self._provider._build(sub, is_collection)
+
+    def __copy__(self):
+        return list(self)
+
+
+class QueryRDFProvider(RDFProvider):
+    '''
+    A vocabulary provider that answers every request by querying an
+    :class:`rdflib.graph.Graph`, instead of building all concepts and
+    collections when it is created.
+
+    The graph can use any rdflib store, including a store on disk. Only the
+    concepts and collections a request needs are built and nothing is kept
+    between requests, so changes to the graph are visible immediately.
+    Requests that need every concept or collection, like :meth:`get_all`,
+    build all of them.
+    '''
+
+    def __init__(self, metadata, graph, **kwargs):
+        '''
+        :param dict metadata: A dictionary with keywords like language.
+        :param rdflib.graph.Graph graph: The graph to query.
+        :param str concept_scheme_uri: The URI of the conceptscheme to use
+            when the graph contains more than one.
+        '''
+        self.graph = graph
+        self.check_in_scheme = False
+        self.lazy = False
+        self.compact = False
+        self._label_index = None
+        if not 'concept_scheme' in kwargs:
+            kwargs['concept_scheme'] = self._cs_from_graph(metadata, **kwargs)
+        else:
+            self.check_in_scheme = True
+        MemoryProvider.__init__(self, metadata, [], **kwargs)
+        self._records = _SubjectRecords(graph, self._record_predicates())
+        self.list = _QueryList(self)
+        self._reset_hierarchy()
+        self._identifier_kinds = set()
+        self._add_identifier_kinds(
+            o for p in IDENTIFIER_PREDICATES for o in graph.objects(None, p)
+        )
+
+    def dump_snapshot(self, path):
+        raise ValueError('A QueryRDFProvider can not be saved to a snapshot.')
+
+    def update(self, added=(), removed=()):
+        '''
+        Add and remove triples from the graph. Since every request queries
+        the graph, they are visible immediately.
+        '''
+        added = list(added)
+        removed = list(removed)
+        for triple in removed:
+            self.graph.remove(triple)
+        for triple in added:
+            self.graph.add(triple)
+        self._add_identifier_kinds(
+            o for s, p, o in added if p in IDENTIFIER_PREDICATES
+        )
+
+    def refresh(self, subjects):
+        '''
+        Since every request queries the graph, only the kinds of literals
+        used as identifiers are looked at again.
+        '''
+        self._identifier_kinds = set()
+        self._add_identifier_kinds(
+            o for p in IDENTIFIER_PREDICATES for o in self.graph.objects(None, p)
+        )
+
+    def _add_identifier_kinds(self, identifiers):
+        '''
+        Remember the datatypes and languages of identifiers that are not
+        plain, string or integer literals, so :meth:`_subject_for_id` knows
+        which other literals to look for.
+        '''
+        for o in identifiers:
+            if isinstance(o, Literal) and (
+                    o.language or
+                    o.datatype not in (None, XSD.string, XSD.integer)):
+                self._identifier_kinds.add((o.datatype, o.language))
+
+    def _get_id_for_subject(self, subject, uri):
+        for p in IDENTIFIER_PREDICATES:
+            values = list(self.graph.objects(subject, p))
+            if len(values) > 1:
+                raise UniquenessError(values)
+            if values:
+                return self.to_text(values[0])
+        return uri
+
+    def _type_of(self, sub):
+        '''
+        :returns: `False` for a concept, `True` for a collection and `None`
+            for any other subject, or a subject outside the conceptscheme.
+        '''
+        if self.check_in_scheme and self._get_in_scheme(sub) != self.concept_scheme.uri:
+            return None
+        if (sub, RDF.type, SKOS.Concept) in self.graph:
+            return False
+        if (sub, RDF.type, SKOS.Collection) in self.graph:
+            return True
+        return None
+
+    def _subjects(self):
+        '''
+        Iterate over the subjects of all concepts and collections, in the
+        order an :class:`RDFProvider` lists them.
+
+        :returns: Tuples of a subject and whether it is a collection.
+        '''
+        for type in (SKOS.Concept, SKOS.Collection):
+            for sub in self.graph.subjects(RDF.type, type):
+                if self.check_in_scheme and self._get_in_scheme(sub) != self.concept_scheme.uri:
+                    continue
+                yield sub, type == SKOS.Collection
+
+    def _subject_for_id(self, id):
+        '''
+        Find the subject of the concept or collection with an id.
+
+        The id is tried as the uri of a subject without an identifier first.
+        Identifiers are looked up as plain and string literals, as integer
+        literals when the id is a number and as literals with the languages
+        used by identifiers in the graph. Only when the graph has identifiers
+        with other datatypes, and none of those match, all identifiers are
+        compared as strings.
+        '''
+        id = str(id)
+        literals = [Literal(id), Literal(id, datatype=XSD.string)]
+        if id.isdigit():
+            literals.append(Literal(id, datatype=XSD.integer))
+        other_datatypes = False
+        for datatype, language in self._identifier_kinds:
+            if language:
+                literals.append(Literal(id, lang=language))
+            else:
+                other_datatypes = True
+
+        def _compared_as_strings():
+            # Only queried when all other candidates failed.
+            if other_datatypes:
+                for row in self.graph.query(
+                        _prepared_query('find_id'),
+                        initBindings={'q': Literal(id)}):
+                    yield row.s
+
+        candidates = itertools.chain(
+            [URIRef(id)],
+            (sub for p in IDENTIFIER_PREDICATES for literal in literals
+             for sub in self.graph.subjects(p, literal)),
+            _compared_as_strings()
+        )
+        for sub in candidates:
+            if self._type_of(sub) is not None and \
+                    self._get_id_for_subject(sub, self.to_text(sub)) == id:
+                return sub
+        return None
+
+    def _build(self, sub, is_collection=None):
+        '''
+        Build the concept or collection for a subject, including its
+        `member_of` and `infer_concept_relations` attributes.
+
+        :returns: A :class:`skosprovider.skos.Concept`,
+            :class:`skosprovider.skos.Collection` or `False`.
+        '''
+        if is_collection is None:
+            is_collection = self._type_of(sub)
+            if is_collection is None:
+                return False
+        if is_collection:
+            c = self._create_collection(sub, self._records)
+            c.infer_concept_relations = self._query_infer_concept_relations(c)
+        else:
+            c = self._create_concept(sub, self._records)
+        c.member_of = [
+            self._get_id_for_subject(col, self.to_text(col))
+            for col in self.graph.subjects(SKOS.member, sub)
+            if self._type_of(col) is True
+        ]
+        return c
+
+    def _query_infer_concept_relations(self, collection):
+        if not collection.superordinates:
+            return False
+        superordinates = set(collection.superordinates)
+        seen = set()
+        todo = list(self.graph.objects(URIRef(collection.uri), SKOS.member))
+        while todo:
+            sub = todo.pop()
+            if sub in seen:
+                continue
+            seen.add(sub)
+            type = self._type_of(sub)
+            if type is False:
+                if any(
+                    self._get_id_for_subject(b, self.to_text(b)) in superordinates
+                    for b in self.graph.objects(sub, SKOS.broader)
+                ):
+                    return True
+            elif type is True:
+                todo.extend(self.graph.objects(sub, SKOS.member))
+        return False
+
+    def get_by_id(self, id):
+        sub = self._subject_for_id(id)
+        return False if sub is None else self._build(sub)
+
+    def get_by_uri(self, uri):
+        return self._build(URIRef(str(uri)))
+
+    def find(self, query, **kwargs):
+        query = self._normalise_query(query)
+        candidates = None
+        if 'label' in query:
+            text = self._normalise_label(query['label'])
+            candidates = {
+                sub
+                for t in self._scrub_label_types()
+                for sub, label in self.graph.subject_objects(URIRef(SKOS[t]))
+                if text in self._normalise_label(self.to_text(label))
+            }
+        if 'matches' in query and query['matches'].get('uri'):
+            uri = query['matches']['uri']
+            matches = {
+                s for k in Concept.matchtypes
+                for o in (URIRef(uri), Literal(uri))
+                for s in self.graph.subjects(URIRef(SKOS[k + 'Match']), o)
+            }
+            candidates = matches if candidates is None else candidates & matches
+        if candidates is None:
+            items = self.list
+        else:
+            items = [
+                self._build(sub, is_collection)
+                for sub, is_collection in self._subjects()
+                if sub in candidates
+            ]
+        filtered = [c for c in items if self._include_in_find(c, query)]
+        language = self._get_language(**kwargs)
+        sort = self._get_sort(**kwargs)
+        reverse_sort = self._get_sort_order(**kwargs) == "desc"
+        return [
+            self._get_find_dict(c, **kwargs)
+            for c in self._sort(filtered, sort, language, reverse_sort)
+        ]
+
+    def expand(self, id):
+        sub = self._subject_for_id(id)
+        if sub is None:
+            return False
+
+        def _children(sub):
+            type = self._type_of(sub)
+            if type is False:
+                return list(self.graph.objects(sub, SKOS.narrower)) + [
+                    s for s in self.graph.objects(sub, SKOS_THES.subordinateArray)
+                    if self._type_of(s) is True
+                    and self._query_infer_concept_relations(self._build(s, True))
+                ]
+            elif type is True:
+                return list(self.graph.objects(sub, SKOS.member))
+            return ()
+
+        def _concept(sub):
+            if self._type_of(sub) is False:
+                return (self._get_id_for_subject(sub, self.to_text(sub)),)
+            return ()
+
+        return list(_reachable_union(sub, _children, _concept, {}))
+
+    def get_top_concepts(self, **kwargs):
+        scheme = URIRef(self.concept_scheme.uri)
+        declared = set(self.graph.objects(scheme, SKOS.hasTopConcept))
+        declared.update(self.graph.subjects(SKOS.topConceptOf, scheme))
+        subjects = list(self._subjects())
+        if any(sub in declared for sub, is_collection in subjects):
+            top = [
+                self._build(sub, False) for sub, is_collection in subjects
+                if sub in declared and not is_collection
+            ]
+        else:
+            # Nothing is kept between requests, the graph can change.
+            memo = {}
+            top = [
+                c for c in (
+                    self._build(sub, False) for sub, is_collection in subjects
+                    if not is_collection
+                    and (sub, SKOS.broader, None) not in self.graph
+                ) if self._is_top_concept(c, memo)
+            ]
+        language = self._get_language(**kwargs)
+        sort = self._get_sort(**kwargs)
+        reverse_sort = self._get_sort_order(**kwargs) == "desc"
+        return [
+            self._get_find_dict(concept, **kwargs)
+            for concept in self._sort(top, sort, language, reverse_sort)
+        ]
+
+    def get_top_display(self, **kwargs):
+        top = [
+            self._build(sub, is_collection)
+            for sub, is_collection in self._subjects()
+            if (sub, SKOS_THES.superOrdinate if is_collection else SKOS.broader,
+                None) not in self.graph
+            and not any(
+                self._type_of(col) is True
+                for col in self.graph.subjects(SKOS.member, sub)
+            )
+        ]
+        return self._get_display_dicts(top, **kwargs)
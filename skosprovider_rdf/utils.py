@@ -1,7 +1,11 @@
 '''
 This module contains utility functions for dealing with skos providers.
 '''
+import io
 import logging
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 from rdflib import Graph
 from rdflib import Literal
@@ -20,7 +24,195 @@ from skosprovider.utils import extract_language
 SKOS_THES = Namespace('http://purl.org/iso25964/skos-thes#')
 log = logging.getLogger(__name__)
 
-def rdf_dumper(provider):
+PREFIXES = (
+    ('skos', SKOS),
+    ('dcterms', DCTERMS),
+    ('skos-thes', SKOS_THES),
+    ('void', VOID),
+    ('rdf', RDF),
+)
+'''
+Prefixes and namespaces used when dumping a provider.
+'''
+
+_LOCAL_NAME = re.compile(r'^[A-Za-z_][A-Za-z0-9_-]*$')
+
+instrument_log = logging.getLogger('skosprovider_rdf.instrument')
+'''
+Logger used by :func:`log_stage`.
+'''
+
+
+def log_stage(stage, stats):
+    '''
+    An instrumentation callback that logs every stage to
+    :data:`instrument_log` at level INFO.
+
+    Can be passed as `instrument` to an
+    :class:`~skosprovider_rdf.providers.RDFProvider` or to the dumpers.
+
+    :param str stage: The name of the stage.
+    :param dict stats: The wall time of the stage in `seconds` and counts.
+    '''
+    instrument_log.info('%s: %s', stage, ', '.join(
+        '%s=%s' % (k, v) for k, v in sorted(stats.items())
+    ))
+
+
+class _Stages:
+    '''
+    Reports the wall time and counts of consecutive stages to an
+    instrumentation callback.
+    '''
+
+    enabled = True
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.first = self.start = time.perf_counter()
+
+    def done(self, stage, **stats):
+        '''
+        Report a stage that started when the previous one was done.
+        '''
+        stats['seconds'] = time.perf_counter() - self.start
+        self.callback(stage, stats)
+        self.start = time.perf_counter()
+
+    def total(self, stage, **stats):
+        '''
+        Report a stage that spans all earlier stages.
+        '''
+        stats['seconds'] = time.perf_counter() - self.first
+        self.callback(stage, stats)
+
+
+class _NoStages:
+    '''
+    Stand-in for :class:`_Stages` when there is no instrumentation callback.
+    '''
+
+    enabled = False
+
+    def done(self, stage, **stats):
+        pass
+
+    def total(self, stage, **stats):
+        pass
+
+
+_NO_STAGES = _NoStages()
+
+
+class _Checkpoints(_NoStages):
+    '''
+    Stand-in for :class:`_Stages` that only passes the name of every stage
+    to a callable, eg. to stop work that is no longer needed, without
+    collecting statistics.
+    '''
+
+    def __init__(self, checkpoint):
+        self.checkpoint = checkpoint
+
+    def done(self, stage, **stats):
+        self.checkpoint(stage)
+
+    def total(self, stage, **stats):
+        self.checkpoint(stage)
+
+
+def _stages(instrument, checkpoint=None):
+    if instrument and checkpoint:
+        def callback(stage, stats):
+            instrument(stage, stats)
+            checkpoint(stage)
+        return _Stages(callback)
+    if instrument:
+        return _Stages(instrument)
+    if checkpoint:
+        return _Checkpoints(checkpoint)
+    return _NO_STAGES
+
+
+def _reachable_union(node, successors, values, memo):
+    '''
+    Collect the values of a node and of all nodes reachable from it.
+
+    The graph is traversed iteratively, so deep nesting can not hit the
+    recursion limit, and strongly connected components are detected with
+    Tarjan's algorithm, so cycles are handled. The result for every node
+    that was traversed is stored in `memo`, so every node and edge is only
+    visited once over all calls sharing the same `memo`.
+
+    :param node: The node to start from.
+    :param successors: Callable returning the nodes a node links to.
+    :param values: Callable returning the values of a single node.
+    :param dict memo: Results of earlier calls.
+    :rtype: :class:`frozenset`
+    '''
+    if node in memo:
+        return memo[node]
+    index = {node: 0}
+    low = {node: 0}
+    stack = [node]
+    on_stack = {node}
+    work = [(node, iter(successors(node)))]
+    while work:
+        v, children = work[-1]
+        for w in children:
+            if w in memo:
+                continue
+            if w not in index:
+                index[w] = low[w] = len(index)
+                stack.append(w)
+                on_stack.add(w)
+                work.append((w, iter(successors(w))))
+                break
+            if w in on_stack:
+                low[v] = min(low[v], index[w])
+        else:
+            work.pop()
+            if work:
+                u = work[-1][0]
+                low[u] = min(low[u], low[v])
+            if low[v] == index[v]:
+                component = []
+                while True:
+                    w = stack.pop()
+                    on_stack.discard(w)
+                    component.append(w)
+                    if w == v:
+                        break
+                result = set()
+                for w in component:
+                    result.update(values(w))
+                    for x in successors(w):
+                        if x in memo:
+                            result.update(memo[x])
+                result = frozenset(result)
+                for w in component:
+                    memo[w] = result
+    return memo[node]
+
+
+class _CountingProvider:
+    '''
+    Wraps a provider to count the calls to `get_by_id`.
+    '''
+
+    def __init__(self, provider):
+        self._provider = provider
+        self.get_by_id_calls = 0
+
+    def get_by_id(self, id):
+        self.get_by_id_calls += 1
+        return self._provider.get_by_id(id)
+
+    def __getattr__(self, name):
+        return getattr(self._provider, name)
+
+
+def rdf_dumper(provider, instrument=None):
     '''
     Dump a provider to a format that can be passed to a
     :class:`skosprovider.providers.RDFProvider`.
@@ -28,12 +220,16 @@ def rdf_dumper(provider):
     :param skosprovider.providers.VocabularyProvider provider: The provider
         that wil be turned into an :class:`rdflib.graph.Graph`.
 
+    :param instrument: A callable that is called with the name and a
+        :class:`dict` of statistics of every stage of the dump, eg.
+        :func:`log_stage`.
+
     :rtype: :class:`rdflib.graph.Graph`
     '''
-    return _rdf_dumper(provider, None)
+    return _rdf_dumper(provider, None, instrument=instrument)
 
 
-def rdf_c_dumper(provider, c):
+def rdf_c_dumper(provider, c, uri_map=None, instrument=None):
     '''
     Dump one concept or collection from a provider to a format that can be passed to a
     :class:`skosprovider.providers.RDFProvider`.
@@ -43,12 +239,58 @@ def rdf_c_dumper(provider, c):
 
     :param String c: identifier
 
+    :param dict uri_map: A map of ids to uris, see :func:`build_uri_map`.
+        Ids that are not in the map are looked up and added to it, so the
+        same map can be passed to several calls.
+
+    :param instrument: See :func:`rdf_dumper`.
+
     :rtype: :class:`rdflib.graph.Graph`
     '''
-    return _rdf_dumper(provider, [c])
+    return _rdf_dumper(provider, [c], uri_map, instrument)
 
 
-def _rdf_dumper(provider, id_list=None):
+def rdf_batch_dumper(provider, ids, uri_map=None, instrument=None):
+    '''
+    Dump several concepts and collections from a provider to a single
+    :class:`rdflib.graph.Graph`.
+
+    Unlike calling :func:`rdf_c_dumper` for every id and merging the graphs,
+    the conceptscheme is only added once and the uris of related concepts
+    and collections are only looked up once. To write the same selection to
+    a file, pass the ids as `id_list` to :func:`rdf_stream_dumper`.
+
+    :param skosprovider.providers.VocabularyProvider provider: The provider
+        that wil be turned into an :class:`rdflib.graph.Graph`.
+
+    :param ids: An iterable of ids of the concepts and collections to dump.
+
+    :param dict uri_map: See :func:`rdf_c_dumper`.
+
+    :param instrument: See :func:`rdf_dumper`.
+
+    :rtype: :class:`rdflib.graph.Graph`
+    '''
+    return _rdf_dumper(provider, list(ids), uri_map, instrument)
+
+
+def build_uri_map(provider):
+    '''
+    Build a map of the ids of all concepts and collections of a provider to
+    their uris.
+
+    The dumpers use this map to find the uri of related concepts and
+    collections, instead of calling `get_by_id` for every relation.
+
+    :param skosprovider.providers.VocabularyProvider provider: The provider
+        to build the map for.
+
+    :rtype: :class:`dict`
+    '''
+    return {str(c['id']): c['uri'] for c in provider.get_all()}
+
+
+def _rdf_dumper(provider, id_list=None, uri_map=None, instrument=None):
     '''
     Dump a provider to a format that can be passed to a
     :class:`skosprovider.providers.RDFProvider`.
@@ -56,31 +298,36 @@ def _rdf_dumper(provider, id_list=None):
     :param skosprovider.providers.VocabularyProvider provider: The provider
         that wil be turned into an :class:`rdflib.graph.Graph`.
 
-    :param List id_list: List of id's of the data to dump.
+    :param List id_list: List of id's of the data to dump. Defaults to all
+        concepts and collections.
+
+    :param dict uri_map: A map of ids to uris, see :func:`build_uri_map`.
+
+    :param instrument: See :func:`rdf_dumper`.
 
     :rtype: :class:`rdflib.graph.Graph`
     '''
-    graph = Graph()
-    graph.namespace_manager.bind("skos", SKOS)
-    graph.namespace_manager.bind("dcterms", DCTERMS)
-    graph.namespace_manager.bind("skos-thes", SKOS_THES)
-    graph.namespace_manager.bind("void", VOID)
-    conceptscheme = URIRef(provider.concept_scheme.uri)
-    _add_in_dataset(graph, conceptscheme, provider)
-    graph.add((conceptscheme, RDF.type, SKOS.ConceptScheme))
-    graph.add((conceptscheme, DCTERMS.identifier,
-              Literal(provider.metadata['id'])))
-    _add_labels(graph, provider.concept_scheme, conceptscheme)
-    _add_notes(graph, provider.concept_scheme, conceptscheme)
-    _add_sources(graph, provider.concept_scheme, conceptscheme)
-    _add_languages(graph, provider.concept_scheme, conceptscheme)
+    stages = _stages(instrument)
+    if stages.enabled:
+        provider = _CountingProvider(provider)
+    graph = _graph()
+    conceptscheme = _add_conceptscheme(graph, provider)
+    stages.done('conceptscheme', triples=len(graph))
+    if uri_map is None:
+        uri_map = {}
     # Add triples using store's add method.
-    if not id_list:
-        id_list = [x['id'] for x in provider.get_all()]
-        for c in provider.get_top_concepts():
-            graph.add((conceptscheme, SKOS.hasTopConcept, URIRef(c['uri'])))
+    if id_list is None:
+        id_list = _add_all(graph, provider, conceptscheme, uri_map)
+        stages.done('all', objects=len(id_list), triples=len(graph))
+    collections = _Collections(provider, uri_map)
     for id in id_list:
-        _add_c(graph, provider, id)
+        _add_c(graph, provider, id, uri_map, collections)
+    if stages.enabled:
+        stages.done(
+            'concepts', objects=len(id_list), triples=len(graph),
+            get_by_id_calls=provider.get_by_id_calls, uri_map=len(uri_map)
+        )
+        stages.total('dump', triples=len(graph))
 
     return graph
 
@@ -93,13 +340,293 @@ def rdf_conceptscheme_dumper(provider):
     :param skosprovider.providers.VocabularyProvider provider: The provider
         that wil be turned into an :class:`rdflib.graph.Graph`.
 
+    :rtype: :class:`rdflib.graph.Graph`
+    '''
+    graph = _graph()
+    conceptscheme = _add_conceptscheme(graph, provider)
+    for c in provider.get_top_concepts():
+        graph.add((conceptscheme, SKOS.hasTopConcept, URIRef(c['uri'])))
+
+    return graph
+
+
+def rdf_chunk_dumper(provider, format='nt', id_list=None, instrument=None):
+    '''
+    Dump a provider as a sequence of serialised chunks, without building an
+    :class:`rdflib.graph.Graph` for the entire provider.
+
+    The first chunk contains the conceptscheme, every next chunk contains
+    one concept or collection. Only the triples of one concept or collection
+    are kept in memory at a time. Since triples are not deduplicated between
+    chunks, a triple can occur more than once in the output, eg. the triples
+    describing a collection that several concepts are a member of.
+
+    :param skosprovider.providers.VocabularyProvider provider: The provider
+        that wil be dumped.
+    :param str format: Either `nt` for N-Triples or `turtle` for Turtle.
+    :param List id_list: List of id's of the data to dump. Defaults to all
+        concepts and collections.
+    :param instrument: See :func:`rdf_dumper`. The time spent by the
+        consumer of the chunks is included in the stages.
+
+    :rtype: A generator of :class:`str`.
+    '''
+    if format not in ('nt', 'turtle'):
+        raise ValueError('Streaming is only supported for nt and turtle.')
+    return _rdf_chunk_dumper(provider, format, id_list, instrument)
+
+
+def _rdf_chunk_dumper(provider, format, id_list, instrument=None):
+    stages = _stages(instrument)
+    if stages.enabled:
+        provider = _CountingProvider(provider)
+    buffer = _TripleBuffer()
+    conceptscheme = _add_conceptscheme(buffer, provider)
+    uri_map = {}
+    if id_list is None:
+        id_list = _add_all(buffer, provider, conceptscheme, uri_map)
+    triples = len(buffer)
+    chunk = buffer.serialize(format)
+    size = len(chunk)
+    stages.done('conceptscheme', triples=triples)
+    if format == 'turtle':
+        yield _turtle_prefixes()
+    yield chunk
+    collections = _Collections(provider, uri_map)
+    for id in id_list:
+        buffer = _TripleBuffer()
+        _add_c(buffer, provider, id, uri_map, collections)
+        chunk = buffer.serialize(format)
+        if stages.enabled:
+            triples += len(buffer)
+            size += len(chunk)
+        yield chunk
+    if stages.enabled:
+        stages.done(
+            'concepts', objects=len(id_list), triples=triples,
+            get_by_id_calls=provider.get_by_id_calls, uri_map=len(uri_map)
+        )
+        stages.total('dump', triples=triples, characters=size)
+
+
+def rdf_stream_dumper(provider, out, format='nt', id_list=None,
+                      instrument=None):
+    '''
+    Dump a provider to a file-like object, one concept or collection at a
+    time. See :func:`rdf_chunk_dumper`.
+
+    :param skosprovider.providers.VocabularyProvider provider: The provider
+        that wil be dumped.
+    :param out: A file-like object opened for writing text or bytes. Bytes
+        are encoded as UTF-8.
+    :param str format: Either `nt` for N-Triples or `turtle` for Turtle.
+    :param List id_list: List of id's of the data to dump. Defaults to all
+        concepts and collections.
+    :param instrument: See :func:`rdf_dumper`.
+    '''
+    binary = isinstance(out, (io.RawIOBase, io.BufferedIOBase))
+    for chunk in rdf_chunk_dumper(provider, format, id_list, instrument):
+        out.write(chunk.encode('utf-8') if binary else chunk)
+
+
+def rdf_parallel_dumper(provider, out, format='nt', id_list=None,
+                        processes=None, chunk_size=500, provider_factory=None,
+                        instrument=None):
+    '''
+    Dump a provider to a file-like object, serialising the concepts and
+    collections in a pool of processes.
+
+    The ids are split in chunks of `chunk_size`. Every worker process
+    serialises the chunks it receives like :func:`rdf_chunk_dumper` does and
+    the chunks are written to `out` in the order of the ids, so the output
+    does not depend on the number of processes.
+
+    The workers need their own provider. By default `provider` is pickled
+    and sent to every worker, so it needs to be picklable. Alternatively,
+    pass a picklable `provider_factory`, eg. a
+    :func:`functools.partial` of
+    :meth:`skosprovider_rdf.providers.RDFProvider.load_snapshot`, that every
+    worker calls once to create its own provider.
+
+    :param skosprovider.providers.VocabularyProvider provider: The provider
+        that wil be dumped.
+    :param out: A file-like object opened for writing text or bytes. Bytes
+        are encoded as UTF-8.
+    :param str format: Either `nt` for N-Triples or `turtle` for Turtle.
+    :param List id_list: List of id's of the data to dump. Defaults to all
+        concepts and collections.
+    :param int processes: Number of worker processes. Defaults to the number
+        of processors.
+    :param int chunk_size: Number of concepts and collections per chunk.
+    :param provider_factory: A callable without arguments that creates the
+        provider in a worker.
+    :param instrument: See :func:`rdf_dumper`. Only the work done in this
+        process is counted.
+    '''
+    if format not in ('nt', 'turtle'):
+        raise ValueError('Streaming is only supported for nt and turtle.')
+    binary = isinstance(out, (io.RawIOBase, io.BufferedIOBase))
+
+    def write(chunk):
+        out.write(chunk.encode('utf-8') if binary else chunk)
+
+    stages = _stages(instrument)
+    buffer = _TripleBuffer()
+    conceptscheme = _add_conceptscheme(buffer, provider)
+    uri_map = {}
+    if id_list is None:
+        id_list = _add_all(buffer, provider, conceptscheme, uri_map)
+    if format == 'turtle':
+        write(_turtle_prefixes())
+    write(buffer.serialize(format))
+    stages.done('conceptscheme', triples=len(buffer))
+    chunks = [
+        id_list[i:i + chunk_size] for i in range(0, len(id_list), chunk_size)
+    ]
+    with ProcessPoolExecutor(
+        max_workers=processes,
+        initializer=_init_dump_worker,
+        initargs=(
+            None if provider_factory else provider,
+            provider_factory,
+            uri_map,
+            format
+        )
+    ) as executor:
+        for chunk in executor.map(_dump_chunk, chunks):
+            write(chunk)
+    stages.done('concepts', objects=len(id_list), chunks=len(chunks))
+    stages.total('dump')
+
+
+_worker = {}
+'''
+State of a worker process of :func:`rdf_parallel_dumper`.
+'''
+
+
+def _init_dump_worker(provider, provider_factory, uri_map, format):
+    _worker['provider'] = provider_factory() if provider_factory else provider
+    _worker['uri_map'] = uri_map
+    _worker['format'] = format
+
+
+def _dump_chunk(id_list):
+    '''
+    Serialise a chunk of concepts and collections in a worker process.
+
+    :param List id_list: List of id's of the data to dump.
+    :rtype: str
+    '''
+    chunk = []
+    # Every chunk has its own collections, so the output does not depend on
+    # the chunks a worker received earlier.
+    collections = _Collections(_worker['provider'], _worker['uri_map'])
+    for id in id_list:
+        buffer = _TripleBuffer()
+        _add_c(
+            buffer, _worker['provider'], id, _worker['uri_map'], collections
+        )
+        chunk.append(buffer.serialize(_worker['format']))
+    return ''.join(chunk)
+
+
+def _turtle_prefixes():
+    return ''.join(
+        '@prefix %s: <%s> .\n' % (prefix, ns) for prefix, ns in PREFIXES
+    ) + '\n'
+
+
+class _TripleBuffer:
+    '''
+    Collects triples, without duplicates and in the order they were added,
+    so they can be serialised without building a graph.
+    '''
+
+    def __init__(self):
+        self.triples = {}
+
+    def __len__(self):
+        return len(self.triples)
+
+    def add(self, triple):
+        self.triples[triple] = None
+
+    def serialize(self, format='nt'):
+        '''
+        :param str format: Either `nt` for N-Triples or `turtle` for Turtle.
+        :rtype: str
+        '''
+        if format == 'nt':
+            return ''.join(
+                '%s %s %s .\n' % tuple(_nt_term(t) for t in triple)
+                for triple in self.triples
+            )
+        subjects = {}
+        for s, p, o in self.triples:
+            subjects.setdefault(s, []).append((p, o))
+        return ''.join(
+            '%s %s .\n\n' % (
+                _turtle_term(s),
+                ' ;\n    '.join(
+                    '%s %s' % (_turtle_term(p), _turtle_term(o)) for p, o in po
+                )
+            ) for s, po in subjects.items()
+        )
+
+
+_NT_ESCAPES = str.maketrans({
+    '\\': '\\\\', '\n': '\\n', '"': '\\"', '\r': '\\r'
+})
+
+
+def _nt_term(term):
+    '''
+    Serialise a term to N-Triples. Literals can't use :meth:`n3`, since it
+    writes strings with a newline between triple quotes.
+    '''
+    if isinstance(term, Literal):
+        quoted = '"%s"' % str(term).translate(_NT_ESCAPES)
+        if term.language:
+            return '%s@%s' % (quoted, term.language)
+        if term.datatype:
+            return '%s^^<%s>' % (quoted, term.datatype)
+        return quoted
+    return term.n3()
+
+
+def _turtle_term(term):
+    '''
+    Serialise a term to Turtle, using the :data:`PREFIXES` where possible.
+    '''
+    if isinstance(term, URIRef):
+        for prefix, ns in PREFIXES:
+            ns = str(ns)
+            if term.startswith(ns) and _LOCAL_NAME.match(term[len(ns):]):
+                return '%s:%s' % (prefix, term[len(ns):])
+    return term.n3()
+
+
+def _graph():
+    '''
+    Create an empty graph with the namespaces used by the dumpers.
+
     :rtype: :class:`rdflib.graph.Graph`
     '''
     graph = Graph()
-    graph.namespace_manager.bind("skos", SKOS)
-    graph.namespace_manager.bind("dcterms", DCTERMS)
-    graph.namespace_manager.bind("skos-thes", SKOS_THES)
-    graph.namespace_manager.bind("void", VOID)
+    for prefix, ns in PREFIXES:
+        graph.namespace_manager.bind(prefix, ns)
+    return graph
+
+
+def _add_conceptscheme(graph, provider):
+    '''
+    Adds the conceptscheme of a provider to the graph.
+
+    :param rdflib.graph.Graph graph: The graph to add statements to.
+    :param skosprovider.providers.VocabularyProvider provider: Provider
+    :returns: The :class:`rdflib.term.URIRef` of the conceptscheme.
+    '''
     conceptscheme = URIRef(provider.concept_scheme.uri)
     _add_in_dataset(graph, conceptscheme, provider)
     graph.add((conceptscheme, RDF.type, SKOS.ConceptScheme))
@@ -109,10 +636,172 @@ def rdf_conceptscheme_dumper(provider):
     _add_notes(graph, provider.concept_scheme, conceptscheme)
     _add_sources(graph, provider.concept_scheme, conceptscheme)
     _add_languages(graph, provider.concept_scheme, conceptscheme)
+    return conceptscheme
+
+
+def _add_all(graph, provider, conceptscheme, uri_map):
+    '''
+    Prepare to dump all concepts and collections of a provider.
+
+    Adds the top concepts to the graph and the uris of all concepts and
+    collections to the uri map.
+
+    :param rdflib.graph.Graph graph: The graph to add statements to.
+    :param skosprovider.providers.VocabularyProvider provider: Provider
+    :param rdflib.term.URIRef conceptscheme: The conceptscheme.
+    :param dict uri_map: A map of ids to uris.
+    :returns: The ids of all concepts and collections.
+    '''
+    all = provider.get_all()
+    uri_map.update((str(c['id']), c['uri']) for c in all)
     for c in provider.get_top_concepts():
         graph.add((conceptscheme, SKOS.hasTopConcept, URIRef(c['uri'])))
+    return [c['id'] for c in all]
 
-    return graph
+
+def _get_uri(provider, id, uri_map):
+    '''
+    Get the uri of a concept or collection, looking it up in the provider if
+    it is not in the uri map yet.
+
+    :param skosprovider.providers.VocabularyProvider provider: Provider
+    :param id: The id of a concept or collection.
+    :param dict uri_map: A map of ids to uris.
+    :returns: A :class:`rdflib.term.URIRef` or `None` if the provider does not
+        know the id.
+    '''
+    key = str(id)
+    if key not in uri_map:
+        c = provider.get_by_id(id)
+        uri_map[key] = c.uri if c else None
+    uri = uri_map[key]
+    return URIRef(uri) if uri else None
+
+
+class _Collections:
+    '''
+    Keeps what the dumper needs to know about the collections of a provider,
+    so it is only computed once per dump, however many members a collection
+    has.
+    '''
+
+    def __init__(self, provider, uri_map):
+        self.provider = provider
+        self.uri_map = uri_map
+        self.collections = {}
+        self.concepts = set()
+        self.dumped = set()
+        self.broader_memo = {}
+        self.broader_sorted = {}
+        self.narrower_memo = {}
+        self.narrower_sorted = {}
+
+    def get(self, id):
+        '''
+        :returns: The collection with an id, or `False` if the provider does
+            not know it.
+        '''
+        key = str(id)
+        if key not in self.collections:
+            c = self.provider.get_by_id(id)
+            self.collections[key] = c
+            if c:
+                self.uri_map[key] = c.uri
+        return self.collections[key]
+
+    def is_collection(self, id):
+        '''
+        :returns: `True` for a collection, `False` for a concept and `None`
+            if the provider does not know the id. Only collections are kept,
+            for concepts only their uri is added to the uri map.
+        '''
+        key = str(id)
+        if key in self.concepts:
+            return False
+        if key not in self.collections:
+            c = self.provider.get_by_id(id)
+            if c and c.type == 'concept':
+                self.uri_map[key] = c.uri
+                self.concepts.add(key)
+                return False
+            self.collections[key] = c
+            if c:
+                self.uri_map[key] = c.uri
+        return True if self.collections[key] else None
+
+    def first(self, id):
+        '''
+        :returns: `True` the first time it is called for a collection, so
+            triples describing the collection are only dumped once.
+        '''
+        key = str(id)
+        if key in self.dumped:
+            return False
+        self.dumped.add(key)
+        return True
+
+    def broader(self, id):
+        '''
+        Get the concepts the members of a collection are narrower than: the
+        superordinates of the collection if it infers concept relations,
+        together with those of its parent collections that do.
+
+        :returns: A sorted :class:`tuple` of :class:`rdflib.term.URIRef`.
+        '''
+        def _infers(key):
+            c = self.get(key)
+            return c and c.type == 'collection' and c.infer_concept_relations
+
+        def _parents(key):
+            if not _infers(key):
+                return ()
+            return [str(pc) for pc in self.get(key).member_of if self.get(pc)]
+
+        def _superordinates(key):
+            if not _infers(key):
+                return ()
+            uris = (
+                _get_uri(self.provider, so, self.uri_map)
+                for so in self.get(key).superordinates
+            )
+            return [uri for uri in uris if uri]
+
+        key = str(id)
+        if key not in self.broader_sorted:
+            # The memo can already hold the unsorted union of a parent.
+            _reachable_union(key, _parents, _superordinates, self.broader_memo)
+            self.broader_sorted[key] = tuple(sorted(self.broader_memo[key]))
+        return self.broader_sorted[key]
+
+    def narrower(self, id):
+        '''
+        Get the concepts that are a member of a collection or of the
+        collections nested in it, the concepts a superordinate concept is
+        broader than if the collection infers concept relations.
+
+        :returns: A sorted :class:`tuple` of :class:`rdflib.term.URIRef`.
+        '''
+        def _members(key):
+            c = self.get(key)
+            if not c or c.type != 'collection':
+                return ()
+            return c.members
+
+        def _nested(key):
+            return [str(m) for m in _members(key) if self.is_collection(m)]
+
+        def _concepts(key):
+            return [
+                URIRef(self.uri_map[str(m)]) for m in _members(key)
+                if self.is_collection(m) is False
+            ]
+
+        key = str(id)
+        if key not in self.narrower_sorted:
+            # The memo can already hold the unsorted union of a nested one.
+            _reachable_union(key, _nested, _concepts, self.narrower_memo)
+            self.narrower_sorted[key] = tuple(sorted(self.narrower_memo[key]))
+        return self.narrower_sorted[key]
 
 
 def _add_in_dataset(graph, subject, provider):
@@ -130,16 +819,24 @@ def _add_in_dataset(graph, subject, provider):
         graph.add((subject, VOID.inDataset, URIRef(duri)))
 
 
-def _add_c(graph, provider, id):
+def _add_c(graph, provider, id, uri_map=None, collections=None):
     '''
     Adds a concept or collection to the graph.
 
     :param rdflib.graph.Graph graph: The graph to add statements to.
     :param skosprovider.providers.VocabularyProvider provider: Provider
     :param c: The id of a concept or collection.
+    :param dict uri_map: A map of ids to uris, used to find the uris of
+        related concepts and collections.
+    :param _Collections collections: The collections seen earlier in the
+        same dump.
     '''
-
+    if uri_map is None:
+        uri_map = {}
+    if collections is None:
+        collections = _Collections(provider, uri_map)
     c = provider.get_by_id(id)
+    uri_map[str(c.id)] = c.uri
     subject = URIRef(c.uri)
     _add_in_dataset(graph, subject, provider)
     if c.id != c.uri:
@@ -152,90 +849,61 @@ def _add_c(graph, provider, id):
     if isinstance(c, Concept):
         graph.add((subject, RDF.type, SKOS.Concept))
         for b in c.broader:
-            broader = provider.get_by_id(b)
+            broader = _get_uri(provider, b, uri_map)
             if broader:
-                graph.add((subject, SKOS.broader, URIRef(broader.uri)))
+                graph.add((subject, SKOS.broader, broader))
         for n in c.narrower:
-            narrower = provider.get_by_id(n)
+            narrower = _get_uri(provider, n, uri_map)
             if narrower:
-                graph.add((subject, SKOS.narrower, URIRef(narrower.uri)))
+                graph.add((subject, SKOS.narrower, narrower))
         for r in c.related:
-            related = provider.get_by_id(r)
+            related = _get_uri(provider, r, uri_map)
             if related:
-                graph.add((subject, SKOS.related, URIRef(related.uri)))
+                graph.add((subject, SKOS.related, related))
         for s in c.subordinate_arrays:
-            subordinate_array = provider.get_by_id(s)
+            subordinate_array = collections.get(s)
             if subordinate_array:
                 graph.add((subject, SKOS_THES.subordinateArray,
                           URIRef(subordinate_array.uri)))
                 if subordinate_array.infer_concept_relations:
-                    def _add_coll_members_to_superordinate(so, members):
-                        '''
-                        Recursively create broader/narrower relations between
-                        collection members and the superordinate concept
-                        '''
-                        for m in members:
-                            member = provider.get_by_id(m)
-                            if member.type == 'concept':
-                                graph.add(
-                                    (so, SKOS.narrower, URIRef(member.uri)))
-                                graph.add(
-                                    (URIRef(member.uri), SKOS.broader, so))
-                            elif member.type == 'collection':
-                                _add_coll_members_to_superordinate(
-                                    so, member.members)
-                    _add_coll_members_to_superordinate(
-                        subject, subordinate_array.members)
+                    # Create broader/narrower relations between the members
+                    # of the collection and the superordinate concept.
+                    for member in collections.narrower(s):
+                        graph.add((subject, SKOS.narrower, member))
+                        graph.add((member, SKOS.broader, subject))
         for coll in c.member_of:
-            collection = provider.get_by_id(coll)
+            collection = collections.get(coll)
             if collection:
                 graph.add(
                     (URIRef(collection.uri), SKOS.member, subject)
                 )
-                graph.add(
-                    (URIRef(collection.uri), RDF.type, SKOS.Collection)
-                )
-                graph.add(
-                    (URIRef(collection.uri), SKOS.inScheme, conceptscheme)
-                )
-                graph.add(
-                    (URIRef(collection.uri), DCTERMS.identifier, Literal(collection.id))
-                )
-                def _add_coll_superordinates_as_broader(member, collection):
-                    '''
-                    Recursively create broader relations between
-                    a collection member and the superordinate concepts
-                    '''
-                    if collection.infer_concept_relations:
-                        for so in collection.superordinates:
-                            superordinate = provider.get_by_id(so)
-                            graph.add((
-                                URIRef(member.uri),
-                                SKOS.broader,
-                                URIRef(superordinate.uri)
-                            ))
-                        for pc in collection.member_of:
-                            parent_collection = provider.get_by_id(pc)
-                            _add_coll_superordinates_as_broader(
-                                member, parent_collection
-                            )
-                _add_coll_superordinates_as_broader(
-                    c, collection
-                )
+                if collections.first(coll):
+                    graph.add(
+                        (URIRef(collection.uri), RDF.type, SKOS.Collection)
+                    )
+                    graph.add(
+                        (URIRef(collection.uri), SKOS.inScheme, conceptscheme)
+                    )
+                    graph.add(
+                        (URIRef(collection.uri), DCTERMS.identifier, Literal(collection.id))
+                    )
+                # Create broader relations between the concept and the
+                # superordinates of the collection and its parents.
+                for superordinate in collections.broader(coll):
+                    graph.add((subject, SKOS.broader, superordinate))
         for k in c.matches.keys():
             for uri in c.matches[k]:
                 graph.add((subject, URIRef(SKOS[k + 'Match']), URIRef(uri)))
     elif isinstance(c, Collection):
         graph.add((subject, RDF.type, SKOS.Collection))
         for m in c.members:
-            member = provider.get_by_id(m)
+            member = _get_uri(provider, m, uri_map)
             if member:
-                graph.add((subject, SKOS.member, URIRef(member.uri)))
+                graph.add((subject, SKOS.member, member))
         for s in c.superordinates:
-            superordinate = provider.get_by_id(s)
+            superordinate = _get_uri(provider, s, uri_map)
             if superordinate:
-                graph.add((subject, SKOS_THES.superOrdinate,
-                          URIRef(superordinate.uri)))
+                graph.add((subject, SKOS_THES.superOrdinate, superordinate))
 
 
 def _add_labels(graph, c, subject):
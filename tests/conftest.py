@@ -3,28 +3,29 @@ import os
 import pytest
 from rdflib import Graph
 
+from skosprovider_rdf.providers import QueryRDFProvider
 from skosprovider_rdf.providers import RDFProvider
 from . import TEST_DIR
 
 
-@pytest.fixture(scope='module')
-def products_provider():
+@pytest.fixture(scope='module', params=[RDFProvider, QueryRDFProvider])
+def products_provider(request):
     products_graph = Graph()
     abspath = os.path.abspath(TEST_DIR + "/data/simple_turtle_products")
     products_graph.parse(abspath, format="turtle")
 
     # Set up rdf_provider
-    products_provider = RDFProvider(
+    products_provider = request.param(
         {'id': 'PRODUCTS'}, products_graph
     )
     return products_provider
 
-@pytest.fixture(scope='module')
-def trees_provider():
+@pytest.fixture(scope='module', params=[RDFProvider, QueryRDFProvider])
+def trees_provider(request):
     trees_graph = Graph()
     abspath = os.path.abspath(TEST_DIR + "/data/trees.xml")
     trees_graph.parse(abspath, format="application/rdf+xml")
-    trees_provider = RDFProvider(
+    trees_provider = request.param(
         {'id': 'TREES'}, trees_graph
     )
     return trees_provider
@@ -54,6 +55,19 @@ def materials_provider():
     )
     return materials
 
+@pytest.fixture(scope='module')
+def materials_graph(materials_provider):
+    from skosprovider_rdf.utils import rdf_dumper
+
+    return rdf_dumper(materials_provider)
+
+@pytest.fixture
+def mutable_materials_graph(materials_graph):
+    graph = Graph()
+    for triple in materials_graph:
+        graph.add(triple)
+    return graph
+
 @pytest.fixture(scope='module')
 def materials_collections_provider():
     products_graph = Graph()
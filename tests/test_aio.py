@@ -0,0 +1,188 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from skosprovider.utils import dict_dumper
+
+from skosprovider_rdf import aio
+from skosprovider_rdf import utils
+from skosprovider_rdf.providers import QueryRDFProvider
+from skosprovider_rdf.providers import RDFProvider
+from skosprovider_rdf.utils import rdf_chunk_dumper
+from . import TEST_DIR
+
+
+class _CountingExecutor(ThreadPoolExecutor):
+
+    def __init__(self):
+        super().__init__(max_workers=4)
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+
+    def submit(self, f, *args):
+        def run():
+            with self.lock:
+                self.running += 1
+                self.max_running = max(self.max_running, self.running)
+            try:
+                return f(*args)
+            finally:
+                with self.lock:
+                    self.running -= 1
+        return super().submit(run)
+
+
+async def _collect(chunks):
+    return [chunk async for chunk in chunks]
+
+
+class TestLoadProvider:
+
+    def test_load_from_graph(self, materials_graph):
+        provider = asyncio.run(
+            aio.load_provider({'id': 'MAT'}, materials_graph)
+        )
+        eager = RDFProvider({'id': 'MAT'}, materials_graph)
+        assert dict_dumper(provider) == dict_dumper(eager)
+
+    def test_load_from_file(self):
+        path = os.path.join(TEST_DIR, 'data', 'simple_turtle_products')
+        provider = asyncio.run(aio.load_provider(
+            {'id': 'PRODUCTS'}, path, format='turtle', cls=QueryRDFProvider
+        ))
+        assert isinstance(provider, QueryRDFProvider)
+        assert provider.get_by_uri('http://www.products.com/Product')
+
+    def test_load_instrument(self, materials_graph):
+        stages = []
+        asyncio.run(aio.load_provider(
+            {'id': 'MAT'}, materials_graph,
+            instrument=lambda stage, stats: stages.append(stage)
+        ))
+        assert stages[-1] == 'load'
+
+    def test_load_without_instrument(self, materials_graph, monkeypatch):
+        def no_stages(callback):
+            raise AssertionError('No statistics should be collected.')
+        monkeypatch.setattr(utils, '_Stages', no_stages)
+        assert asyncio.run(aio.load_provider({'id': 'MAT'}, materials_graph))
+
+    def test_cancel_load(self, materials_graph):
+        reached = threading.Event()
+        proceed = threading.Event()
+        stages = []
+
+        def instrument(stage, stats):
+            stages.append(stage)
+            reached.set()
+            proceed.wait(5)
+
+        async def load(executor):
+            task = asyncio.create_task(aio.load_provider(
+                {'id': 'MAT'}, materials_graph,
+                executor=executor, instrument=instrument
+            ))
+            await asyncio.get_running_loop().run_in_executor(
+                None, reached.wait, 5
+            )
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        executor = ThreadPoolExecutor(max_workers=1)
+        asyncio.run(load(executor))
+        proceed.set()
+        executor.shutdown(wait=True)
+        assert len(stages) == 1
+
+    def test_cancelled_load_holds_semaphore(self, materials_graph):
+        reached = threading.Event()
+        proceed = threading.Event()
+
+        def instrument(stage, stats):
+            reached.set()
+            proceed.wait(5)
+
+        async def load(executor):
+            semaphore = asyncio.Semaphore(1)
+            cancelled = asyncio.create_task(aio.load_provider(
+                {'id': 'MAT'}, materials_graph, executor=executor,
+                semaphore=semaphore, instrument=instrument
+            ))
+            await asyncio.get_running_loop().run_in_executor(
+                None, reached.wait, 5
+            )
+            cancelled.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await cancelled
+            task = asyncio.create_task(aio.load_provider(
+                {'id': 'MAT'}, materials_graph, executor=executor,
+                semaphore=semaphore
+            ))
+            await asyncio.sleep(0.1)
+            assert not task.done()
+            assert executor.running == 1
+            proceed.set()
+            return await task
+
+        executor = _CountingExecutor()
+        assert asyncio.run(load(executor))
+        executor.shutdown()
+        assert executor.max_running == 1
+
+    def test_process_pool_not_supported(self, materials_graph):
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            with pytest.raises(ValueError):
+                asyncio.run(aio.load_provider(
+                    {'id': 'MAT'}, materials_graph, executor=executor
+                ))
+
+
+class TestChunkDumper:
+
+    @pytest.mark.parametrize('format', ['nt', 'turtle'])
+    def test_same_as_chunk_dumper(self, materials_provider, format):
+        chunks = asyncio.run(_collect(aio.rdf_chunk_dumper(
+            materials_provider, format=format, chunk_size=10
+        )))
+        assert len(chunks) > 1
+        assert ''.join(chunks) == ''.join(
+            rdf_chunk_dumper(materials_provider, format=format)
+        )
+
+    def test_bounded_concurrency(self, materials_provider):
+        executor = _CountingExecutor()
+
+        async def dump():
+            semaphore = asyncio.Semaphore(1)
+            return await asyncio.gather(*[
+                _collect(aio.rdf_chunk_dumper(
+                    materials_provider, chunk_size=5,
+                    executor=executor, semaphore=semaphore
+                ))
+                for i in range(3)
+            ])
+
+        dumps = asyncio.run(dump())
+        executor.shutdown()
+        assert dumps[0] == dumps[1] == dumps[2]
+        assert executor.max_running == 1
+
+    def test_stop_consuming(self, materials_provider):
+        stages = []
+
+        async def first():
+            chunks = aio.rdf_chunk_dumper(
+                materials_provider, chunk_size=1,
+                instrument=lambda stage, stats: stages.append(stage)
+            )
+            chunk = await chunks.__anext__()
+            await chunks.aclose()
+            return chunk
+
+        assert asyncio.run(first())
+        assert stages == ['conceptscheme']
@@ -1,13 +1,33 @@
+import gc
 import os
+import pickle
+import shutil
 
 import pytest
 from rdflib import Graph
+from rdflib import Literal
+from rdflib import URIRef
+from rdflib.compare import isomorphic
+from rdflib.namespace import DC
+from rdflib.namespace import DCTERMS
+from rdflib.namespace import RDF
+from rdflib.namespace import SKOS
+from rdflib.namespace import XSD
 from skosprovider.skos import Collection
+from skosprovider.skos import Concept
 from skosprovider.skos import ConceptScheme
+from skosprovider.skos import Label
 from skosprovider.skos import Note
+from skosprovider.uri import UriPatternGenerator
 from skosprovider.utils import dict_dumper
 
+from skosprovider_rdf import providers
+from skosprovider_rdf.providers import QueryRDFProvider
 from skosprovider_rdf.providers import RDFProvider
+from skosprovider_rdf.providers import SKOS_THES
+from skosprovider_rdf.providers import _GroupedRecords
+from skosprovider_rdf.providers import _SubjectRecords
+from skosprovider_rdf.providers import _read_html
 from . import TEST_DIR
 
 
@@ -42,6 +62,37 @@ class TestRDFProviderProducts:
         with pytest.raises(ValueError):
             products_provider._create_label("literal","nonexistinglabeltype")
 
+    def test_create_label_checks_language_once(self, products_provider,
+                                               monkeypatch):
+        literal = Literal('Parfum', lang='nl')
+        expected = Label('Parfum', 'altLabel', 'nl')
+        products_provider._create_label(literal, 'altLabel')
+        monkeypatch.setattr(providers.tags, 'check', None)
+        label = products_provider._create_label(literal, 'altLabel')
+        assert label == expected
+        assert label.uri is None
+        assert label.label_types == []
+        assert repr(label) == repr(expected)
+
+    def test_restored_like_constructed(self, products_provider):
+        # Labels and notes are restored without calling __init__, so they
+        # need to end up with the attributes skosprovider sets in it.
+        label = products_provider._create_label(
+            Literal('Parfum', lang='nl'), 'altLabel'
+        )
+        assert vars(label) == vars(Label('Parfum', 'altLabel', 'nl'))
+        note = products_provider._create_note(
+            Literal('Een parfum.', lang='nl'), 'definition'
+        )
+        assert vars(note) == vars(Note('Een parfum.', 'definition', 'nl'))
+        html = products_provider._create_note(
+            Literal('<p xml:lang="nl">Een parfum.</p>', datatype=RDF.HTML),
+            'definition'
+        )
+        assert vars(html) == vars(
+            Note('<p>Een parfum.</p>', 'definition', 'nl', 'HTML')
+        )
+
     def test_createNote(self, products_provider):
         with pytest.raises(ValueError):
             products_provider._create_note("literal","nonexistingnotetype")
@@ -50,7 +101,12 @@ class TestRDFProviderProducts:
         u_product = "http://www.products.com/Product"
         cona = products_provider.get_by_id(u_product)
         conb = products_provider.get_by_uri(u_product)
-        assert cona == conb
+        if isinstance(products_provider, QueryRDFProvider):
+            # A QueryRDFProvider builds a new concept for every request.
+            assert cona.uri == conb.uri
+            assert cona.id == conb.id
+        else:
+            assert cona == conb
 
     def test_get_unexisting_by_uri(self, products_provider):
         con = products_provider.get_by_uri('http://www.products.com/Thingy')
@@ -157,6 +213,19 @@ class TestRDFProviderProducts:
     def test_no_literal(self, products_provider):
         assert products_provider._get_language_from_literal("test") is None
 
+    def test_invalid_language_logged_once(self, products_provider, caplog):
+        # Invalid languages are cached for the process, so every provider
+        # class needs a tag of its own.
+        tag = 'xx-invalid-tag-%s' % type(products_provider).__name__.lower()
+        for label in ('one', 'two'):
+            assert products_provider._get_language_from_literal(
+                Literal(label, lang=tag)
+            ) == 'und'
+        warnings = [
+            r for r in caplog.records if tag in r.getMessage()
+        ]
+        assert len(warnings) == 1
+
 
 class TestMultipleConceptschemes:
 
@@ -210,6 +279,39 @@ class TestMultipleConceptschemes:
         assert 'https://id.erfgoed.net/toepassingen' in str(exc.value)
         assert 'https://id.erfgoed.net/applicaties' in str(exc.value)
 
+    def test_for_schemes(self):
+        wb_graph = Graph()
+        abspath = os.path.abspath(TEST_DIR + "/data/waarde_en_besluit_types.ttl")
+        wb_graph.parse(abspath, format="turtle")
+        metadata = {
+            'https://id.erfgoed.net/thesauri/waardetypes': {'id': 'WAARDETYPES'},
+            'https://id.erfgoed.net/thesauri/besluittypes': {'id': 'BESLUITTYPES'},
+        }
+        providers = RDFProvider.for_schemes(metadata, wb_graph)
+        assert list(providers) == list(metadata)
+        for uri, provider in providers.items():
+            single = RDFProvider(
+                metadata[uri], wb_graph, concept_scheme_uri=uri
+            )
+            assert provider.concept_scheme.uri == uri
+            assert provider.concept_scheme.labels == single.concept_scheme.labels
+            assert provider.get_metadata() == single.get_metadata()
+            assert dict_dumper(provider) == dict_dumper(single)
+        waardetypes, besluittypes = providers.values()
+        assert len(waardetypes.get_all()) == 21
+        assert waardetypes._identifiers is besluittypes._identifiers
+
+    def test_for_schemes_wrong_conceptscheme(self):
+        wb_graph = Graph()
+        abspath = os.path.abspath(TEST_DIR + "/data/waarde_en_besluit_types.ttl")
+        wb_graph.parse(abspath, format="turtle")
+        with pytest.raises(RuntimeError) as exc:
+            RDFProvider.for_schemes(
+                {'https://id.erfgoed.net/thesauri/waartypes': {'id': 'WAAR'}},
+                wb_graph
+            )
+        assert 'https://id.erfgoed.net/thesauri/waardetypes' in str(exc.value)
+
 
 class TestTreeProvider:
 
@@ -230,6 +332,14 @@ class TestTreeProvider:
         assert not trees_provider.get_by_id('http://id.trees.org/2')
         assert not trees_provider.get_by_id('http://id.trees.org/3')
 
+    def test_get_by_id_and_uri_use_index(self, trees_provider):
+        if isinstance(trees_provider, QueryRDFProvider):
+            pytest.skip('A QueryRDFProvider does not keep an index.')
+        for c in trees_provider.list:
+            assert trees_provider.get_by_id(c.id) is c
+            assert trees_provider.get_by_id(int(c.id)) is c
+            assert trees_provider.get_by_uri(c.uri) is c
+
     def test_rdf_provider_list(self, trees_provider):
         dump = dict_dumper(trees_provider)
 
@@ -303,3 +413,728 @@ class TestTreeProvider:
             }
         })
         assert len(close_larches) == 1
+
+
+class TestRecords:
+
+    def test_grouped_and_subject_records_build_the_same(self, trees_provider):
+        graph = trees_provider.graph
+        predicates = trees_provider._record_predicates()
+        grouped = _GroupedRecords(graph, predicates)
+        single = _SubjectRecords(graph, predicates)
+        for sub in graph.subjects(RDF.type, SKOS.Concept):
+            a = trees_provider._create_concept(sub, grouped)
+            b = trees_provider._create_concept(sub, single)
+            assert a.id == b.id
+            assert a.labels == b.labels
+            assert a.notes == b.notes
+            assert [s.citation for s in a.sources] == [s.citation for s in b.sources]
+            assert a.broader == b.broader
+            assert a.matches == b.matches
+
+
+class TestLazyRDFProvider:
+
+    def test_lazy_builds_nothing_up_front(self, materials_graph):
+        provider = RDFProvider({'id': 'MAT'}, materials_graph, lazy=True)
+        assert len(provider.list._cache) == 0
+        assert provider.get_by_id(43).type == 'collection'
+        assert len(provider.list._cache) == 1
+
+    def test_lazy_equals_eager(self, materials_graph):
+        eager = RDFProvider({'id': 'MAT'}, materials_graph)
+        lazy = RDFProvider({'id': 'MAT'}, materials_graph, lazy=True)
+        assert len(lazy.list) == len(eager.list)
+        for c in eager.list:
+            lc = lazy.get_by_uri(c.uri)
+            assert lc.id == c.id
+            assert lc.labels == c.labels
+            assert sorted(lc.member_of) == sorted(c.member_of)
+            if c.type == 'collection':
+                assert lc.infer_concept_relations == c.infer_concept_relations
+        assert lazy.get_top_concepts() == eager.get_top_concepts()
+        assert lazy.find({'label': 'kwarts'}) == eager.find({'label': 'kwarts'})
+        assert set(lazy.expand(68)) == {'39', '70'}
+
+    def test_lazy_bounded_cache(self, materials_graph):
+        provider = RDFProvider(
+            {'id': 'MAT'}, materials_graph, lazy=True, cache_size=2
+        )
+        assert len(provider.get_all()) == len(provider.list)
+        assert len(provider.list._cache) == 2
+        assert provider.get_by_id(13).id == '13'
+
+    @pytest.mark.parametrize('mode', ['lazy', 'compact'])
+    def test_top_concepts_keep_cache_bounded(self, materials_graph, mode):
+        provider = RDFProvider(
+            {'id': 'MAT'}, materials_graph, cache_size=2, **{mode: True}
+        )
+        top = provider.get_top_concepts()
+        display = provider.get_top_display()
+        assert top and display
+        gc.collect()
+        built = [
+            o for o in gc.get_objects()
+            if isinstance(o, (Concept, Collection))
+            and o.concept_scheme is provider.concept_scheme
+        ]
+        assert len(built) <= 2
+        assert provider.get_top_concepts() == top
+        assert provider.get_top_display() == display
+
+    def test_lazy_unexisting(self, materials_graph):
+        provider = RDFProvider({'id': 'MAT'}, materials_graph, lazy=True)
+        assert not provider.get_by_id(404)
+        assert not provider.get_by_uri('urn:x-skosprovider:404')
+
+
+class TestMemberOf:
+
+    def test_member_of_matches_members(self, materials_graph):
+        provider = RDFProvider({'id': 'MAT'}, materials_graph)
+        collections = [c for c in provider.list if c.type == 'collection']
+        assert collections
+        for c in provider.list:
+            expected = [col.id for col in collections if c.id in col.members]
+            assert c.member_of == expected
+
+    def test_member_of_duplicate_members(self, trees_provider):
+        provider = RDFProvider({'id': 'TREES'}, trees_provider.graph)
+        species = provider.get_by_id(3)
+        species.members.append(species.members[0])
+        for c in provider.list:
+            c.member_of = []
+        provider._fill_member_of(provider.list)
+        assert provider.get_by_id(species.members[0]).member_of == ['3']
+
+
+class TestInferConceptRelations:
+
+    def _graph(self, depth, cycle=False):
+        graph = Graph()
+        top = URIRef('http://id.example.org/top')
+        leaf = URIRef('http://id.example.org/leaf')
+        for c in (top, leaf):
+            graph.add((c, RDF.type, SKOS.Concept))
+        graph.add((leaf, SKOS.broader, top))
+        cols = [
+            URIRef('http://id.example.org/col/%d' % i) for i in range(depth)
+        ]
+        for i, col in enumerate(cols):
+            graph.add((col, RDF.type, SKOS.Collection))
+            graph.add((col, DCTERMS.identifier, Literal('col%d' % i)))
+            if i + 1 < depth:
+                graph.add((col, SKOS.member, cols[i + 1]))
+        graph.add((cols[-1], SKOS.member, leaf))
+        graph.add((cols[0], SKOS_THES.superOrdinate, top))
+        if cycle:
+            graph.add((cols[-1], SKOS.member, cols[0]))
+        return graph
+
+    def test_deeply_nested_collections(self):
+        provider = RDFProvider({'id': 'DEEP'}, self._graph(3000))
+        assert provider.get_by_id('col0').infer_concept_relations is True
+        assert provider.get_by_id('col1').infer_concept_relations is False
+
+    def test_cyclic_collections(self):
+        provider = RDFProvider({'id': 'CYCLE'}, self._graph(3, cycle=True))
+        assert provider.get_by_id('col0').infer_concept_relations is True
+        assert provider.get_by_id('col2').infer_concept_relations is False
+        assert provider.get_by_id('col0').member_of == ['col2']
+        lazy = RDFProvider({'id': 'CYCLE'}, self._graph(3, cycle=True), lazy=True)
+        assert lazy.get_by_id('col0').infer_concept_relations is True
+        assert lazy.get_by_id('col2').infer_concept_relations is False
+
+
+class TestIdentifiers:
+
+    def _graph(self):
+        graph = Graph()
+        for i in range(3):
+            c = URIRef('http://id.example.org/%d' % i)
+            graph.add((c, RDF.type, SKOS.Concept))
+            graph.add((c, DCTERMS.identifier, Literal(str(i))))
+        graph.add((URIRef('http://id.example.org/2'), DC.identifier, Literal('x')))
+        return graph
+
+    def test_dcterms_identifier_takes_precedence(self):
+        provider = RDFProvider({'id': 'IDS'}, self._graph())
+        assert provider.get_by_uri('http://id.example.org/2').id == '2'
+
+    def test_all_conflicts_reported_at_once(self):
+        graph = self._graph()
+        for i in (0, 1):
+            graph.add((
+                URIRef('http://id.example.org/%d' % i),
+                DCTERMS.identifier,
+                Literal('other%d' % i)
+            ))
+        with pytest.raises(RuntimeError) as exc:
+            RDFProvider({'id': 'IDS'}, graph)
+        assert 'http://id.example.org/0 (0, other0)' in str(exc.value)
+        assert 'http://id.example.org/1 (1, other1)' in str(exc.value)
+
+
+class TestSnapshots:
+
+    def test_dump_and_load_snapshot(self, materials_graph, tmp_path):
+        provider = RDFProvider({'id': 'MAT'}, materials_graph)
+        path = str(tmp_path / 'mat.snapshot')
+        provider.dump_snapshot(path)
+        loaded = RDFProvider.load_snapshot(path)
+        assert loaded.graph is None
+        assert loaded.concept_scheme.uri == provider.concept_scheme.uri
+        assert loaded.get_all() == provider.get_all()
+        assert loaded.get_by_id(43).infer_concept_relations is True
+        assert loaded.get_by_id(44).member_of == provider.get_by_id(44).member_of
+        assert set(loaded.expand(68)) == {'39', '70'}
+
+    def test_lazy_provider_can_not_be_dumped(self, materials_graph, tmp_path):
+        provider = RDFProvider({'id': 'MAT'}, materials_graph, lazy=True)
+        with pytest.raises(ValueError):
+            provider.dump_snapshot(str(tmp_path / 'mat.snapshot'))
+
+    def test_snapshot_cache(self, tmp_path):
+        source = str(tmp_path / 'trees.xml')
+        shutil.copy(os.path.join(TEST_DIR, 'data', 'trees.xml'), source)
+        cache_dir = str(tmp_path / 'cache')
+
+        built = RDFProvider.from_snapshot_cache({'id': 'TREES'}, [source], cache_dir)
+        assert built.graph is not None
+        assert len(os.listdir(cache_dir)) == 1
+
+        cached = RDFProvider.from_snapshot_cache({'id': 'TREES'}, [source], cache_dir)
+        assert cached.graph is None
+        assert cached.get_all() == built.get_all()
+
+        other_args = RDFProvider.from_snapshot_cache(
+            {'id': 'TREES'}, [source], cache_dir, case_insensitive=False
+        )
+        assert other_args.graph is not None
+        assert len(os.listdir(cache_dir)) == 2
+
+        with open(source, 'a') as f:
+            f.write('\n')
+        changed = RDFProvider.from_snapshot_cache({'id': 'TREES'}, [source], cache_dir)
+        assert changed.graph is not None
+        # The snapshot of the old content was removed.
+        assert len(os.listdir(cache_dir)) == 2
+
+    def test_snapshot_cache_same_metadata(self, tmp_path):
+        source = os.path.join(TEST_DIR, 'data', 'trees.xml')
+        cache_dir = str(tmp_path / 'cache')
+        metadata = {'id': 'TREES'}
+        RDFProvider.from_snapshot_cache(metadata, source, cache_dir)
+        assert metadata == {'id': 'TREES'}
+        cached = RDFProvider.from_snapshot_cache(metadata, source, cache_dir)
+        assert cached.graph is None
+        assert len(os.listdir(cache_dir)) == 1
+
+    def test_snapshot_cache_key(self, tmp_path):
+        source = os.path.join(TEST_DIR, 'data', 'trees.xml')
+        cache_dir = str(tmp_path / 'cache')
+        with pytest.raises(ValueError):
+            RDFProvider.from_snapshot_cache(
+                {'id': 'TREES'}, source, cache_dir,
+                uri_generator=UriPatternGenerator('urn:x-trees:%s')
+            )
+        for i in range(2):
+            provider = RDFProvider.from_snapshot_cache(
+                {'id': 'TREES'}, source, cache_dir, key='trees-v1',
+                uri_generator=UriPatternGenerator('urn:x-trees:%s')
+            )
+        assert provider.graph is None
+        RDFProvider.from_snapshot_cache(
+            {'id': 'TREES'}, source, cache_dir, key='trees-v2',
+            uri_generator=UriPatternGenerator('urn:x-trees:%s')
+        )
+        assert len(os.listdir(cache_dir)) == 2
+
+    def test_snapshot_cache_single_file(self, tmp_path):
+        source = os.path.join(TEST_DIR, 'data', 'trees.xml')
+        cache_dir = str(tmp_path / 'cache')
+        built = RDFProvider.from_snapshot_cache({'id': 'TREES'}, source, cache_dir)
+        cached = RDFProvider.from_snapshot_cache({'id': 'TREES'}, [source], cache_dir)
+        assert cached.graph is None
+        assert cached.get_all() == built.get_all()
+        assert len(os.listdir(cache_dir)) == 1
+
+    def test_snapshot_cache_rejects_uncacheable(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(providers, '_parse', None)
+        with pytest.raises(ValueError):
+            RDFProvider.from_snapshot_cache(
+                {'id': 'TREES'}, os.path.join(TEST_DIR, 'data', 'trees.xml'),
+                str(tmp_path / 'cache'), lazy=True
+            )
+        with pytest.raises(ValueError):
+            with open(os.path.join(TEST_DIR, 'data', 'trees.xml'), 'rb') as f:
+                RDFProvider.from_snapshot_cache(
+                    {'id': 'TREES'}, f, str(tmp_path / 'cache')
+                )
+
+
+class TestCompact:
+
+    def test_compact_restored_like_constructed(self, materials_graph):
+        compact = RDFProvider({'id': 'MAT'}, materials_graph, compact=True)
+        for c in compact.get_all():
+            c = compact.get_by_id(c['id'])
+            for l in c.labels:
+                assert vars(l) == vars(Label(l.label, l.type, l.language))
+            for n in c.notes:
+                assert vars(n) == vars(
+                    Note(n.note, n.type, n.language, n.markup)
+                )
+
+    def test_compact_equals_eager(self, materials_graph):
+        eager = RDFProvider({'id': 'MAT'}, materials_graph)
+        compact = RDFProvider({'id': 'MAT'}, materials_graph, compact=True)
+        assert dict_dumper(compact) == dict_dumper(eager)
+        assert compact.get_by_id(43).infer_concept_relations is True
+        assert compact.find({'label': 'kwarts'}) == eager.find({'label': 'kwarts'})
+        assert compact.get_top_concepts() == eager.get_top_concepts()
+        assert set(compact.expand(68)) == {'39', '70'}
+        assert len(compact.list._cache) == 0
+
+    def test_compact_shares_strings(self, materials_graph):
+        compact = RDFProvider(
+            {'id': 'MAT'}, materials_graph, compact=True, cache_size=None
+        )
+        a, b = [c for c in compact.list if c.labels][:2]
+        assert a.labels[0].language is b.labels[0].language
+        assert compact.get_by_id(a.id) is a
+
+    def test_compact_snapshot_and_pickle(self, materials_graph, tmp_path):
+        compact = RDFProvider({'id': 'MAT'}, materials_graph, compact=True)
+        path = str(tmp_path / 'mat.snapshot')
+        compact.dump_snapshot(path)
+        loaded = RDFProvider.load_snapshot(path)
+        assert dict_dumper(loaded) == dict_dumper(compact)
+        assert dict_dumper(pickle.loads(pickle.dumps(loaded))) == \
+            dict_dumper(compact)
+
+    def test_compact_can_not_be_updated(self, materials_graph):
+        compact = RDFProvider({'id': 'MAT'}, materials_graph, compact=True)
+        with pytest.raises(ValueError):
+            compact.update()
+        with pytest.raises(ValueError):
+            RDFProvider({'id': 'MAT'}, materials_graph, compact=True, lazy=True)
+
+    def test_release_graph(self, materials_graph):
+        provider = RDFProvider(
+            {'id': 'MAT'}, materials_graph, release_graph=True
+        )
+        assert provider.graph is None
+        assert provider.get_by_id(43).type == 'collection'
+        with pytest.raises(ValueError):
+            provider.update()
+        with pytest.raises(ValueError):
+            RDFProvider(
+                {'id': 'MAT'}, materials_graph, lazy=True, release_graph=True
+            )
+
+
+class TestLabelIndex:
+
+    queries = [
+        {'label': 'kwarts'},
+        {'label': 'KWARTS'},
+        {'label': 'Kwarts', 'type': 'concept'},
+        {'label': 'kwarts', 'type': 'collection'},
+        {'label': 'ij'},
+        {'label': ''},
+        {'label': 'does not exist'},
+        {'label': 'en', 'type': 'all'},
+        {'label': 'steen'},
+    ]
+
+    @pytest.mark.parametrize('case_insensitive', [True, False])
+    def test_index_finds_the_same(self, materials_graph, case_insensitive):
+        plain = RDFProvider(
+            {'id': 'MAT'}, materials_graph, case_insensitive=case_insensitive
+        )
+        indexed = RDFProvider(
+            {'id': 'MAT'}, materials_graph, case_insensitive=case_insensitive,
+            label_index=True
+        )
+        assert indexed._label_index
+        for query in self.queries:
+            assert indexed.find(dict(query)) == plain.find(dict(query))
+            assert indexed.find(dict(query), language='en', sort='label') == \
+                plain.find(dict(query), language='en', sort='label')
+
+    def test_index_is_used(self, materials_graph, monkeypatch):
+        indexed = RDFProvider({'id': 'MAT'}, materials_graph, label_index=True)
+        checked = []
+        include = indexed._include_in_find
+        monkeypatch.setattr(
+            indexed, '_include_in_find',
+            lambda c, q: checked.append(c) or include(c, q)
+        )
+        found = indexed.find({'label': 'kwarts'})
+        assert found
+        assert len(checked) < len(indexed.list)
+
+    def test_compact_index_builds_candidates_once(self, materials_graph):
+        compact = RDFProvider(
+            {'id': 'MAT'}, materials_graph, compact=True, cache_size=0,
+            label_index=True
+        )
+        candidates = compact._find_label_candidates('kwarts')
+        misses = compact.list.misses
+        assert compact.find({'label': 'kwarts'})
+        assert compact.list.misses - misses == len(candidates)
+
+    def test_lazy_label_index(self, materials_graph):
+        with pytest.raises(ValueError):
+            RDFProvider({'id': 'MAT'}, materials_graph, lazy=True, label_index=True)
+
+
+class TestHierarchy:
+
+    def _graph(self, top_concepts=False):
+        graph = Graph()
+        scheme = URIRef('http://id.example.org/scheme')
+        graph.add((scheme, RDF.type, SKOS.ConceptScheme))
+        c = [URIRef('http://id.example.org/%d' % i) for i in range(4)]
+        for uri in c:
+            graph.add((uri, RDF.type, SKOS.Concept))
+            graph.add((uri, SKOS.inScheme, scheme))
+        for broader, narrower in ((0, 1), (1, 2), (2, 1)):
+            graph.add((c[broader], SKOS.narrower, c[narrower]))
+            graph.add((c[narrower], SKOS.broader, c[broader]))
+        if top_concepts:
+            graph.add((scheme, SKOS.hasTopConcept, c[0]))
+            graph.add((c[3], SKOS.topConceptOf, scheme))
+        return graph
+
+    def test_expand_with_cycle(self):
+        provider = RDFProvider({'id': 'H'}, self._graph())
+        assert set(provider.expand('http://id.example.org/0')) == {
+            'http://id.example.org/0',
+            'http://id.example.org/1',
+            'http://id.example.org/2',
+        }
+        assert set(provider.expand('http://id.example.org/2')) == {
+            'http://id.example.org/1',
+            'http://id.example.org/2',
+        }
+        assert 'http://id.example.org/1' in provider._expand_memo
+        assert not provider.expand('http://id.example.org/404')
+
+    def test_expand_deep_hierarchy(self):
+        graph = Graph()
+        c = [URIRef('http://id.example.org/%d' % i) for i in range(3000)]
+        for i, uri in enumerate(c):
+            graph.add((uri, RDF.type, SKOS.Concept))
+            if i:
+                graph.add((c[i - 1], SKOS.narrower, uri))
+        provider = RDFProvider({'id': 'DEEP'}, graph)
+        assert len(provider.expand('http://id.example.org/0')) == 3000
+
+    def test_structural_top_concepts(self):
+        provider = RDFProvider({'id': 'H'}, self._graph())
+        assert {c['id'] for c in provider.get_top_concepts()} == {
+            'http://id.example.org/0', 'http://id.example.org/3'
+        }
+        assert provider._top_concepts is not None
+
+    def test_declared_top_concepts(self):
+        graph = self._graph(top_concepts=True)
+        provider = RDFProvider({'id': 'H'}, graph)
+        assert {c['id'] for c in provider.get_top_concepts()} == {
+            'http://id.example.org/0', 'http://id.example.org/3'
+        }
+        graph.remove((None, SKOS.topConceptOf, None))
+        provider = RDFProvider({'id': 'H'}, graph)
+        assert [c['id'] for c in provider.get_top_concepts()] == [
+            'http://id.example.org/0'
+        ]
+
+
+class TestUpdate:
+
+    def _assert_same(self, provider, graph, **kwargs):
+        fresh = RDFProvider({'id': 'MAT'}, graph, **kwargs)
+        assert len(provider.list) == len(fresh.list)
+        for c in fresh.list:
+            pc = provider.get_by_uri(c.uri)
+            assert provider.get_by_id(c.id) is pc
+            assert pc.labels == c.labels
+            assert pc.notes == c.notes
+            assert sorted(pc.member_of) == sorted(c.member_of)
+            if c.type == 'collection':
+                assert pc.members == c.members
+                assert pc.infer_concept_relations == c.infer_concept_relations
+            else:
+                assert pc.broader == c.broader
+                assert pc.narrower == c.narrower
+        assert provider.get_top_concepts() == fresh.get_top_concepts()
+        for query in ({'label': 'kwarts'}, {'label': 'nieuw'}):
+            assert provider.find(dict(query)) == fresh.find(dict(query))
+
+    def test_update_label(self, mutable_materials_graph):
+        graph = mutable_materials_graph
+        provider = RDFProvider({'id': 'MAT'}, graph, label_index=True)
+        uri = URIRef(provider.get_by_id(13).uri)
+        provider.update(
+            added=[(uri, SKOS.altLabel, Literal('nieuw materiaal', lang='nl'))]
+        )
+        assert [c['id'] for c in provider.find({'label': 'nieuw'})] == ['13']
+        self._assert_same(provider, graph)
+
+    def test_update_add_and_remove(self, mutable_materials_graph):
+        graph = mutable_materials_graph
+        provider = RDFProvider({'id': 'MAT'}, graph)
+        collection = next(c for c in provider.list if c.type == 'collection')
+        concept = next(c for c in provider.list if c.type == 'concept')
+        broader = URIRef(concept.uri)
+        new = URIRef('https://id.erfgoed.net/thesauri/materialen/1000')
+        provider.update(added=[
+            (new, RDF.type, SKOS.Concept),
+            (new, DCTERMS.identifier, Literal('1000')),
+            (new, SKOS.prefLabel, Literal('nieuw', lang='nl')),
+            (new, SKOS.broader, broader),
+            (broader, SKOS.narrower, new),
+            (URIRef(collection.uri), SKOS.member, new),
+        ])
+        assert provider.get_by_id(1000).broader == [concept.id]
+        assert provider.get_by_id(1000).member_of == [collection.id]
+        assert '1000' in provider.expand(concept.id)
+        self._assert_same(provider, graph)
+
+        provider.update(removed=list(graph.triples((broader, None, None))))
+        assert not provider.get_by_id(concept.id)
+        self._assert_same(provider, graph)
+
+    def test_refresh_collection(self, mutable_materials_graph):
+        graph = mutable_materials_graph
+        provider = RDFProvider({'id': 'MAT'}, graph)
+        collection = next(
+            c for c in provider.list if c.type == 'collection' and c.members
+        )
+        uri = URIRef(collection.uri)
+        graph.remove((uri, SKOS.member, None))
+        provider.refresh([uri])
+        assert provider.get_by_id(collection.id).members == []
+        self._assert_same(provider, graph)
+
+    def test_update_conflicting_identifier(self, mutable_materials_graph):
+        graph = mutable_materials_graph
+        provider = RDFProvider({'id': 'MAT'}, graph)
+        uri = URIRef(provider.get_by_id(13).uri)
+        with pytest.raises(RuntimeError):
+            provider.update(added=[(uri, DCTERMS.identifier, Literal('x'))])
+
+    def test_update_lazy(self, materials_graph):
+        provider = RDFProvider({'id': 'MAT'}, materials_graph, lazy=True)
+        with pytest.raises(ValueError):
+            provider.update()
+
+
+class TestFromFile:
+
+    def test_from_file_equals_graph(self):
+        path = os.path.join(TEST_DIR, 'data', 'waarde_en_besluit_types.ttl')
+        graph = Graph()
+        graph.parse(path, format='turtle')
+        uri = 'https://id.erfgoed.net/thesauri/besluittypes'
+        provider = RDFProvider(
+            {'id': 'BESLUIT'}, graph, concept_scheme_uri=uri
+        )
+        from_file = RDFProvider.from_file(
+            {'id': 'BESLUIT'}, path, concept_scheme_uri=uri
+        )
+        assert len(from_file.graph) < len(graph)
+        assert dict_dumper(from_file) == dict_dumper(provider)
+        assert from_file.concept_scheme.labels == provider.concept_scheme.labels
+
+    def test_from_file_drops_other_triples(self, tmp_path):
+        path = tmp_path / 'concepts.ttl'
+        path.write_text('''
+            @prefix skos: <http://www.w3.org/2004/02/skos/core#> .
+            @prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+            @prefix owl: <http://www.w3.org/2002/07/owl#> .
+            <http://id.example.org/1> a skos:Concept, owl:Thing ;
+                skos:prefLabel "One"@en ;
+                rdfs:label "One" .
+        ''')
+        provider = RDFProvider.from_file({'id': 'ONE'}, [path])
+        assert len(provider.graph) == 2
+        assert provider.get_by_uri('http://id.example.org/1').label().label == 'One'
+        with open(path, 'rb') as f:
+            provider = RDFProvider.from_file({'id': 'ONE'}, f, format='turtle')
+        assert len(provider.list) == 1
+
+    @pytest.mark.parametrize('format', ['xml', 'turtle', 'nt', 'n3', 'json-ld'])
+    def test_from_file_drops_other_triples_in_every_format(self, tmp_path,
+                                                           format):
+        graph = Graph()
+        graph.parse(os.path.join(TEST_DIR, 'data', 'trees.xml'), format='xml')
+        kept = Graph()
+        for triple in graph:
+            kept.add(triple)
+        thing = URIRef('http://id.example.org/thing')
+        graph.add((thing, RDF.type, URIRef('http://www.w3.org/2002/07/owl#Thing')))
+        graph.add((thing, URIRef('http://www.w3.org/2000/01/rdf-schema#label'), Literal('Thing')))
+        path = tmp_path / 'trees'
+        path.write_text(graph.serialize(format=format))
+        provider = RDFProvider.from_file({'id': 'TREES'}, [path], format=format)
+        assert len(provider.graph) == len(kept)
+        assert isomorphic(provider.graph, kept)
+
+
+class TestQueryRDFProvider:
+
+    def test_query_equals_eager(self, materials_graph):
+        eager = RDFProvider({'id': 'MAT'}, materials_graph)
+        query = QueryRDFProvider({'id': 'MAT'}, materials_graph)
+        assert dict_dumper(query) == dict_dumper(eager)
+        assert query.get_by_id(43).infer_concept_relations is True
+        for q in (
+                {'label': 'kwarts'},
+                {'label': 'KWARTS'},
+                {'type': 'collection'},
+                {'collection': {'id': 43, 'depth': 'all'}}):
+            assert query.find(dict(q)) == eager.find(dict(q))
+        assert query.get_top_concepts() == eager.get_top_concepts()
+        assert query.get_top_display() == eager.get_top_display()
+        assert set(query.expand(68)) == set(eager.expand(68))
+        for id in (43, 68):
+            assert query.get_children_display(id) == \
+                eager.get_children_display(id)
+        assert not query.get_by_id(404)
+        assert not query.expand(404)
+
+    def test_query_keeps_no_hierarchy(self, materials_graph):
+        query = QueryRDFProvider({'id': 'MAT'}, materials_graph)
+        query.get_top_concepts()
+        query.get_top_display()
+        assert query._top_concepts is None
+        assert query._top_display is None
+        assert query._higher_memo == {}
+
+    def test_query_case_insensitive(self, materials_graph):
+        metadata = {'id': 'MAT'}
+        eager = RDFProvider(metadata, materials_graph, case_insensitive=False)
+        query = QueryRDFProvider(
+            metadata, materials_graph, case_insensitive=False
+        )
+        assert query.find({'label': 'KWARTS'}) == \
+            eager.find({'label': 'KWARTS'})
+
+    def test_query_sees_updates(self, mutable_materials_graph):
+        graph = mutable_materials_graph
+        provider = QueryRDFProvider({'id': 'MAT'}, graph)
+        uri = URIRef(provider.get_by_id(13).uri)
+        provider.update(
+            added=[(uri, SKOS.altLabel, Literal('nieuw materiaal', lang='nl'))]
+        )
+        assert [c['id'] for c in provider.find({'label': 'nieuw'})] == ['13']
+        graph.remove((uri, SKOS.altLabel, Literal('nieuw materiaal', lang='nl')))
+        assert provider.find({'label': 'nieuw'}) == []
+
+    def test_query_identifier_kinds(self, monkeypatch):
+        graph = Graph()
+        for i, identifier in enumerate((
+                Literal('een', lang='nl'),
+                Literal('A-1', datatype=XSD.token),
+                Literal('7'))):
+            uri = URIRef('http://id.example.org/%d' % i)
+            graph.add((uri, RDF.type, SKOS.Concept))
+            graph.add((uri, DCTERMS.identifier, identifier))
+        graph.add((URIRef('http://id.example.org/uri'), RDF.type, SKOS.Concept))
+        provider = QueryRDFProvider({'id': 'KINDS'}, graph)
+        assert provider.get_by_id('een').uri == 'http://id.example.org/0'
+        assert provider.get_by_id('A-1').uri == 'http://id.example.org/1'
+        assert provider.get_by_id(7).uri == 'http://id.example.org/2'
+        assert provider.get_by_id('http://id.example.org/uri')
+        assert not provider.get_by_id('http://id.example.org/0')
+
+        graph.remove((None, DCTERMS.identifier, Literal('A-1', datatype=XSD.token)))
+        provider.refresh([])
+
+        def no_query(name):
+            raise AssertionError('%s should not be queried' % name)
+        monkeypatch.setattr(providers, '_prepared_query', no_query)
+        assert provider.get_by_id('een')
+        assert provider.get_by_id('http://id.example.org/uri')
+        assert not provider.get_by_id('A-1')
+        assert not provider.get_by_id('http://id.example.org/404')
+
+    def test_query_update_with_generator(self):
+        graph = Graph()
+        uri = URIRef('http://id.example.org/1')
+        provider = QueryRDFProvider({'id': 'KINDS'}, graph)
+        provider.update(added=(t for t in (
+            (uri, RDF.type, SKOS.Concept),
+            (uri, DCTERMS.identifier, Literal('een', lang='nl'))
+        )))
+        assert len(graph) == 2
+        assert provider.get_by_id('een').uri == 'http://id.example.org/1'
+
+    def test_query_can_not_be_dumped(self, materials_graph, tmp_path):
+        provider = QueryRDFProvider({'id': 'MAT'}, materials_graph)
+        with pytest.raises(ValueError):
+            provider.dump_snapshot(str(tmp_path / 'mat.snapshot'))
+
+    def test_query_conceptscheme(self):
+        wb_graph = Graph()
+        abspath = os.path.abspath(TEST_DIR + "/data/waarde_en_besluit_types.ttl")
+        wb_graph.parse(abspath, format="turtle")
+        uri = 'https://id.erfgoed.net/thesauri/waardetypes'
+        eager = RDFProvider(
+            {'id': 'WAARDETYPES'}, wb_graph, concept_scheme_uri=uri
+        )
+        query = QueryRDFProvider(
+            {'id': 'WAARDETYPES'}, wb_graph, concept_scheme_uri=uri
+        )
+        assert query.concept_scheme.uri == uri
+        assert dict_dumper(query) == dict_dumper(eager)
+
+
+class TestHtmlNotes:
+
+    def _note(self, html):
+        provider = RDFProvider({'id': 'TREES'}, Graph())
+        literal = Literal(html, datatype=RDF.HTML)
+        return provider._create_note(literal, 'definition'), literal
+
+    def test_language_is_removed(self):
+        note, literal = self._note(
+            '<p xml:lang="nl" class="a&amp;b">Een <b>soort</b> boom.</p>'
+            '<p>Tweede</p>'
+        )
+        assert note.note == \
+            '<p class="a&amp;b">Een <b>soort</b> boom.</p><p>Tweede</p>'
+        assert note.language == 'nl'
+        assert note.markup == 'HTML'
+        assert literal.value.firstChild.getAttribute('xml:lang') == 'nl'
+
+    def test_same_as_toxml(self):
+        html = (
+            '<p xml:lang="en" title="a\tb\nc &quot;d&quot; &lt;e&gt;" '
+            'class="x">Een <br> <b>boom</b></p> na'
+        )
+        note, literal = self._note(html)
+        dom = literal.value.cloneNode(True)
+        dom.firstChild.removeAttribute('xml:lang')
+        assert note.note == dom.toxml()
+
+    def test_without_language(self):
+        note, literal = self._note('Een <br> boom')
+        assert note.note == 'Een <br/> boom'
+        assert note.language == 'und'
+
+    def test_empty_element(self):
+        note, literal = self._note('<p xml:lang="en"></p>')
+        assert note.note == '<p/>'
+        assert note.language == 'en'
+
+    def test_html_is_cached(self):
+        html = '<p xml:lang="en">Cached <i>note</i></p>'
+        self._note(html)
+        hits = _read_html.cache_info().hits
+        note, literal = self._note(html)
+        assert _read_html.cache_info().hits == hits + 1
+        assert note.note == '<p>Cached <i>note</i></p>'
@@ -1,6 +1,10 @@
+import io
+import os
+
 import pytest
 from rdflib import Graph
 from rdflib import Namespace
+from rdflib.compare import isomorphic
 from rdflib.namespace import DCTERMS
 from rdflib.namespace import DC
 from rdflib.namespace import RDF
@@ -19,6 +23,7 @@ from skosprovider.skos import (
 
 from skosprovider_rdf.providers import RDFProvider
 from skosprovider_rdf import utils
+from . import TEST_DIR
 
 import logging
 log = logging.getLogger(__name__)
@@ -350,3 +355,366 @@ class TestRDFDumperTrees:
         assert (cs, RDF.type, SKOS.ConceptScheme) in graph_dump
         assert (cs, SKOS.definition, Literal('<p xml:lang="en">Trees as used by Monthy Python.</p>', datatype=RDF.HTML)) in graph_dump
         assert (cs, SKOS.prefLabel, Literal('Pythonic trees.', lang='en')) in graph_dump
+
+
+class TestStreamingDumper:
+
+    @pytest.mark.parametrize('format', ['nt', 'turtle'])
+    def test_stream_equals_graph(self, materials_provider, format):
+        out = io.StringIO()
+        utils.rdf_stream_dumper(materials_provider, out, format=format)
+        streamed = Graph()
+        streamed.parse(data=out.getvalue(), format=format)
+        assert isomorphic(streamed, utils.rdf_dumper(materials_provider))
+
+    def test_stream_to_bytes(self, tree_provider):
+        out = io.BytesIO()
+        utils.rdf_stream_dumper(tree_provider, out, format='turtle')
+        dump = out.getvalue().decode('utf-8')
+        assert dump.startswith('@prefix skos: <http://www.w3.org/2004/02/skos/core#> .')
+        assert 'la châtaigne' in dump
+        streamed = Graph()
+        streamed.parse(data=dump, format='turtle')
+        assert len(streamed) == len(utils.rdf_dumper(tree_provider))
+
+    def test_chunks(self, tree_provider):
+        chunks = list(utils.rdf_chunk_dumper(tree_provider, id_list=[1, 2]))
+        assert len(chunks) == 3
+        assert '<http://id.trees.org/1>' in chunks[1]
+        assert '<http://id.trees.org/2>' not in chunks[1].split(' ')[0]
+
+    def test_nt_escapes_literals(self):
+        note = 'Line one\nline "two" \\ three'
+        provider = DictionaryProvider({'id': 'NT'}, [{
+            'id': 1,
+            'notes': [Note(note, 'note', 'en')]
+        }])
+        out = io.StringIO()
+        utils.rdf_stream_dumper(provider, out, format='nt')
+        assert '\\n' in out.getvalue()
+        streamed = Graph()
+        streamed.parse(data=out.getvalue(), format='nt')
+        assert Literal(note, lang='en') in streamed.objects(None, SKOS.note)
+
+    def test_empty_id_list(self, tree_provider):
+        out = io.StringIO()
+        utils.rdf_stream_dumper(tree_provider, out, id_list=[])
+        streamed = Graph()
+        streamed.parse(data=out.getvalue(), format='nt')
+        assert isomorphic(streamed, utils.rdf_batch_dumper(tree_provider, []))
+        assert not set(streamed.subjects(RDF.type, SKOS.Concept))
+
+    def test_unsupported_format(self, tree_provider):
+        with pytest.raises(ValueError):
+            utils.rdf_chunk_dumper(tree_provider, format='xml')
+
+
+def _count_get_by_id(provider, monkeypatch):
+    calls = []
+    get_by_id = provider.get_by_id
+
+    def counting_get_by_id(id):
+        calls.append(id)
+        return get_by_id(id)
+    monkeypatch.setattr(provider, 'get_by_id', counting_get_by_id)
+    return calls
+
+
+class TestUriMap:
+
+    def test_build_uri_map(self, tree_provider):
+        uri_map = utils.build_uri_map(tree_provider)
+        assert uri_map['1'] == 'http://id.trees.org/1'
+        assert len(uri_map) == len(tree_provider.get_all())
+
+    def test_rdf_dumper_does_not_look_up_relations(self, monkeypatch):
+        provider = DictionaryProvider({'id': 'NUMBERS'}, [
+            {'id': 1, 'narrower': list(range(2, 20))}
+        ] + [
+            {'id': i, 'broader': [1], 'related': [i + 1]} for i in range(2, 20)
+        ])
+        calls = _count_get_by_id(provider, monkeypatch)
+        graph = utils.rdf_dumper(provider)
+        # Every concept once and the unexisting related concept 20 once.
+        assert len(calls) == 20
+        assert (
+            URIRef('urn:x-skosprovider:numbers:2'),
+            SKOS.broader,
+            URIRef('urn:x-skosprovider:numbers:1')
+        ) in graph
+
+    def test_uri_map_shared_between_calls(self, tree_provider, monkeypatch):
+        calls = _count_get_by_id(tree_provider, monkeypatch)
+        uri_map = {}
+        utils.rdf_c_dumper(tree_provider, 1, uri_map=uri_map)
+        assert '1' in uri_map
+        first = len(calls)
+        graph = utils.rdf_c_dumper(tree_provider, 1, uri_map=uri_map)
+        assert (URIRef('http://id.trees.org/3'), SKOS.member, URIRef('http://id.trees.org/1')) in graph
+        assert len(calls) - first <= first
+
+
+class TestBatchDumper:
+
+    def _members(self, provider):
+        collection = [
+            c for c in provider.get_all() if c['type'] == 'collection'
+        ][0]
+        return collection, [
+            m for m in provider.get_by_id(collection['id']).members
+            if provider.get_by_id(m).type == 'concept'
+        ]
+
+    def test_batch_equals_merged_graphs(self, materials_provider):
+        ids = [c['id'] for c in materials_provider.get_all()][:20]
+        merged = Graph()
+        for id in ids:
+            merged += utils.rdf_c_dumper(materials_provider, id)
+        batch = utils.rdf_batch_dumper(materials_provider, iter(ids))
+        assert isomorphic(batch, merged)
+
+    def test_batch_without_ids(self, tree_provider):
+        graph = utils.rdf_batch_dumper(tree_provider, [])
+        assert set(graph.subjects()) == {
+            URIRef(tree_provider.concept_scheme.uri)
+        }
+
+    def test_batch_shares_lookups(self, materials_provider):
+        ids = [c['id'] for c in materials_provider.get_all()]
+        stats = {}
+
+        def instrument(stage, s):
+            stats[stage] = s
+        get_by_id_calls = 0
+        for id in ids:
+            utils.rdf_c_dumper(materials_provider, id, instrument=instrument)
+            get_by_id_calls += stats['concepts']['get_by_id_calls']
+        utils.rdf_batch_dumper(materials_provider, ids, instrument=instrument)
+        assert stats['concepts']['get_by_id_calls'] < get_by_id_calls
+
+    def test_collection_header_once(self, materials_provider):
+        collection, members = self._members(materials_provider)
+        assert len(members) > 1
+        dump = ''.join(utils.rdf_chunk_dumper(materials_provider, id_list=members))
+        header = '<%s> <%s> <%s> .' % (
+            collection['uri'], RDF.type, SKOS.Collection
+        )
+        assert dump.count(header) == 1
+        assert dump.count('<%s> <%s>' % (collection['uri'], SKOS.member)) == \
+            len(members)
+
+
+class TestCollectionsOncePerDump:
+
+    def _provider(self, members=50, cyclic=False):
+        return DictionaryProvider({'id': 'COLL'}, [
+            {'id': 1, 'subordinate_arrays': [100]},
+            {'id': 2, 'subordinate_arrays': [101]},
+            {
+                'id': 100, 'type': 'collection', 'superordinates': [1],
+                'members': [101], 'infer_concept_relations': True,
+                'member_of': [101] if cyclic else []
+            },
+            {
+                'id': 101, 'type': 'collection', 'superordinates': [2],
+                'members': list(range(10, 10 + members)) + (
+                    [100] if cyclic else []
+                ),
+                'member_of': [100], 'infer_concept_relations': True
+            },
+        ] + [
+            {'id': i, 'broader': [1, 2], 'member_of': [101]}
+            for i in range(10, 10 + members)
+        ])
+
+    def test_collection_looked_up_once(self, monkeypatch):
+        provider = self._provider()
+        calls = _count_get_by_id(provider, monkeypatch)
+        graph = utils.rdf_batch_dumper(provider, range(10, 60))
+        # Every concept, both collections and both superordinates once.
+        assert len(calls) == 50 + 2 + 2
+        for i in range(10, 60):
+            for so in (1, 2):
+                assert (
+                    URIRef('urn:x-skosprovider:coll:%d' % i),
+                    SKOS.broader,
+                    URIRef('urn:x-skosprovider:coll:%d' % so)
+                ) in graph
+
+    def test_cyclic_collections(self):
+        provider = self._provider(members=2, cyclic=True)
+        graph = utils.rdf_c_dumper(provider, 10)
+        assert set(graph.objects(
+            URIRef('urn:x-skosprovider:coll:10'), SKOS.broader
+        )) == {
+            URIRef('urn:x-skosprovider:coll:1'),
+            URIRef('urn:x-skosprovider:coll:2')
+        }
+
+    def test_broader_of_parent_is_sorted(self):
+        provider = self._provider(members=2)
+        collections = utils._Collections(provider, {})
+        collections.broader(101)
+        expected = (
+            URIRef('urn:x-skosprovider:coll:1'),
+            URIRef('urn:x-skosprovider:coll:2')
+        )
+        assert collections.broader(101) == expected
+        assert collections.broader(100) == expected[:1]
+        assert isinstance(collections.broader(100), tuple)
+
+    def test_narrower_of_nested_is_sorted(self):
+        provider = self._provider(members=3)
+        collections = utils._Collections(provider, {})
+        collections.narrower(100)
+        expected = tuple(
+            URIRef('urn:x-skosprovider:coll:%d' % i) for i in (10, 11, 12)
+        )
+        assert collections.narrower(100) == expected
+        assert collections.narrower(101) == expected
+        assert isinstance(collections.narrower(101), tuple)
+
+    def test_cyclic_subordinate_arrays(self):
+        provider = self._provider(members=2, cyclic=True)
+        graph = utils.rdf_dumper(provider)
+        for so in (1, 2):
+            assert set(graph.objects(
+                URIRef('urn:x-skosprovider:coll:%d' % so), SKOS.narrower
+            )) == {
+                URIRef('urn:x-skosprovider:coll:10'),
+                URIRef('urn:x-skosprovider:coll:11')
+            }
+
+    def test_nested_members_looked_up_once(self, monkeypatch):
+        depth = 50
+        provider = DictionaryProvider({'id': 'DEEP'}, [
+            {'id': 'so%d' % i, 'subordinate_arrays': ['c%d' % i]}
+            for i in range(depth)
+        ] + [
+            {
+                'id': 'c%d' % i, 'type': 'collection',
+                'superordinates': ['so%d' % i],
+                'infer_concept_relations': True,
+                'members': ['c%d' % (i + 1)] if i + 1 < depth else ['leaf']
+            }
+            for i in range(depth)
+        ] + [{'id': 'leaf'}])
+        calls = _count_get_by_id(provider, monkeypatch)
+        graph = utils.rdf_batch_dumper(
+            provider, ['so%d' % i for i in range(depth)]
+        )
+        # Every concept and collection once, instead of once for every
+        # superordinate it is nested under.
+        assert len(calls) == 2 * depth + 1
+        assert len(set(graph.subjects(
+            SKOS.narrower, URIRef('urn:x-skosprovider:deep:leaf')
+        ))) == depth
+
+
+def _trees_provider_factory():
+    graph = Graph()
+    graph.parse(os.path.join(TEST_DIR, 'data', 'trees.xml'), format='xml')
+    return RDFProvider({'id': 'TREES'}, graph)
+
+
+class TestParallelDumper:
+
+    @pytest.mark.parametrize('format', ['nt', 'turtle'])
+    def test_parallel_equals_graph(self, materials_provider, format):
+        out = io.StringIO()
+        utils.rdf_parallel_dumper(
+            materials_provider, out, format=format, processes=2, chunk_size=7
+        )
+        dumped = Graph()
+        dumped.parse(data=out.getvalue(), format=format)
+        assert isomorphic(dumped, utils.rdf_dumper(materials_provider))
+
+    def test_parallel_empty_id_list(self, tree_provider):
+        out = io.StringIO()
+        utils.rdf_parallel_dumper(tree_provider, out, id_list=[], processes=1)
+        dumped = Graph()
+        dumped.parse(data=out.getvalue(), format='nt')
+        assert isomorphic(dumped, utils.rdf_batch_dumper(tree_provider, []))
+
+    def test_parallel_is_deterministic(self, materials_provider):
+        outs = []
+        for processes in (1, 3):
+            out = io.StringIO()
+            utils.rdf_parallel_dumper(
+                materials_provider, out, processes=processes, chunk_size=5
+            )
+            outs.append(
+                [l for l in out.getvalue().splitlines() if '_:' not in l]
+            )
+        assert outs[0] == outs[1]
+
+    def test_parallel_with_provider_factory(self):
+        provider = _trees_provider_factory()
+        out = io.BytesIO()
+        utils.rdf_parallel_dumper(
+            provider, out, processes=2, chunk_size=1,
+            provider_factory=_trees_provider_factory
+        )
+        dumped = Graph()
+        dumped.parse(data=out.getvalue().decode('utf-8'), format='nt')
+        assert len(dumped) == len(utils.rdf_dumper(provider))
+
+
+class TestInstrumentation:
+
+    def _collect(self):
+        stages = []
+        return stages, lambda stage, stats: stages.append((stage, stats))
+
+    def test_rdf_dumper_stages(self, tree_provider):
+        stages, instrument = self._collect()
+        graph = utils.rdf_dumper(tree_provider, instrument=instrument)
+        assert [s for s, stats in stages] == [
+            'conceptscheme', 'all', 'concepts', 'dump'
+        ]
+        stats = dict(stages)
+        assert stats['concepts']['objects'] == len(tree_provider.get_all())
+        assert stats['concepts']['get_by_id_calls'] >= 3
+        assert stats['dump']['triples'] == len(graph)
+        assert all(stats['seconds'] >= 0 for s, stats in stages)
+
+    def test_stream_dumper_stages(self, tree_provider):
+        stages, instrument = self._collect()
+        out = io.StringIO()
+        utils.rdf_stream_dumper(tree_provider, out, instrument=instrument)
+        stats = dict(stages)
+        assert stats['dump']['characters'] == len(out.getvalue())
+        assert stats['dump']['triples'] == len(out.getvalue().splitlines())
+
+    def test_provider_stages(self, tree_provider):
+        stages, instrument = self._collect()
+        provider = RDFProvider(
+            {'id': 'TREES'}, utils.rdf_dumper(tree_provider),
+            instrument=instrument
+        )
+        assert [s for s, stats in stages] == [
+            'identifiers', 'conceptscheme', 'records', 'build', 'member_of',
+            'infer', 'index', 'top_concepts', 'load'
+        ]
+        stats = dict(stages)
+        assert stats['build']['objects'] == len(provider.list)
+        assert stats['load']['objects'] == len(provider.list)
+        assert 'language_cache_hits' in stats['load']
+
+    def test_log_stage(self, caplog):
+        with caplog.at_level(logging.INFO, logger='skosprovider_rdf.instrument'):
+            utils.log_stage('build', {'objects': 3, 'seconds': 0.5})
+        assert 'build: objects=3, seconds=0.5' in caplog.text
+
+    def test_cache_stats(self, tree_provider):
+        provider = RDFProvider(
+            {'id': 'TREES'}, utils.rdf_dumper(tree_provider), lazy=True
+        )
+        provider.get_by_id(1)
+        provider.get_by_id(1)
+        stats = provider.cache_stats()
+        assert stats['object_cache_hits'] == 1
+        assert stats['object_cache_misses'] == 1
+        assert 'object_cache_hits' not in RDFProvider(
+            {'id': 'TREES'}, utils.rdf_dumper(tree_provider)
+        ).cache_stats()